@@ -0,0 +1,180 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from colors import Colors
+from grid_graph import GridGraph
+from load_graphs import load_all_graphs
+from path_cache import PathCache
+from zelda_journey import ZeldaJourney
+
+
+DEFAULT_MAP_FILES = {
+    "main": "../Datasets/txt/main_map.txt",
+    **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
+}
+
+DEFAULT_DUNGEONS = {
+    Colors.DUNGEON1: "dungeon_0",
+    Colors.DUNGEON2: "dungeon_1",
+    Colors.DUNGEON3: "dungeon_2",
+}
+
+CSV_FIELDS = ["id", "total_cost", "path_length", "seconds", "steps", "error"]
+
+# Graphs of the current process. Set before the pool starts, so forked workers
+# share the parent's pages; spawned workers load them in _init_worker.
+_graphs_info = None
+_path_cache = None
+
+
+def load_scenarios(file_path: str) -> List[Dict]:
+    """Read scenarios from a JSONL file, one JSON object per line.
+
+    Every key is optional:
+    - "id": identifier echoed in the results (defaults to the line number)
+    - "start": [x, y] overworld start (defaults to Link's position)
+    - "dungeons": names of the dungeons to visit (defaults to all of them)
+    - "goal": [x, y] final target (defaults to the Master Sword)
+    - "strategy": "greedy" or "planned"
+    """
+    scenarios = []
+    with open(file_path, "r") as file:
+        for number, line in enumerate(file, start=1):
+            if line.strip():
+                scenario = json.loads(line)
+                scenario.setdefault("id", number)
+                scenarios.append(scenario)
+    return scenarios
+
+
+def _init_worker(map_files: Dict[str, str], cache_dir: Optional[str]) -> None:
+    global _graphs_info, _path_cache
+    if _graphs_info is None:
+        _graphs_info = load_all_graphs(map_files, graph_class=GridGraph, cache_dir=cache_dir)
+    _path_cache = PathCache()
+
+
+def run_scenario(
+    scenario: Dict,
+    dungeons: Dict[tuple, str],
+    graphs_info: Optional[Dict[str, Dict]] = None,
+    path_cache: Optional[PathCache] = None
+) -> Dict:
+    """Run one scenario, by default against the graphs and PathCache of the current process.
+
+    Returns:
+        The result record: id, total_cost, path_length, seconds, steps (action,
+        length and cost of each segment) and error (None on success).
+    """
+    start_time = time.perf_counter()
+    result = {"id": scenario["id"], "total_cost": None, "path_length": None, "steps": None, "error": None}
+    try:
+        names = scenario.get("dungeons")
+        if names is not None:
+            unknown = sorted(set(names) - set(dungeons.values()))
+            if unknown:
+                raise ValueError(f"Unknown dungeons: {', '.join(map(str, unknown))}")
+        journey = ZeldaJourney(
+            _graphs_info if graphs_info is None else graphs_info,
+            {color: name for color, name in dungeons.items() if names is None or name in names},
+            strategy=scenario.get("strategy", "greedy"),
+            path_cache=_path_cache if path_cache is None else path_cache,
+            start=tuple(scenario["start"]) if "start" in scenario else None,
+            goal=tuple(scenario["goal"]) if "goal" in scenario else None
+        )
+        path = journey.run()
+        result["total_cost"] = journey.total_cost
+        result["path_length"] = len(path)
+        result["steps"] = [
+            {"action": step["Action"], "length": step["PathLength"], "cost": step["IncrementalCost"]}
+            for step in journey.steps
+        ]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+def run_batch(
+    scenarios: Iterable[Dict],
+    map_files: Dict[str, str],
+    dungeons: Dict[tuple, str] = DEFAULT_DUNGEONS,
+    workers: Optional[int] = None,
+    cache_dir: Optional[str] = None
+) -> Iterator[Dict]:
+    """Run scenarios across a process pool, yielding each result as soon as it finishes.
+
+    The graphs are loaded once, in this process, before the pool starts;
+    results therefore come back in completion order, not scenario order.
+
+    Parameters:
+        scenarios: Scenario dicts, as read by load_scenarios.
+        map_files: Map files passed to load_all_graphs.
+        dungeons: Mapping from entrance color to dungeon name.
+        workers: Number of worker processes (defaults to the CPU count).
+        cache_dir: Optional grid cache directory for load_all_graphs.
+    """
+    _init_worker(map_files, cache_dir)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(map_files, cache_dir)
+    ) as executor:
+        futures = [executor.submit(run_scenario, scenario, dungeons) for scenario in scenarios]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class ResultWriter:
+    """Append results to a JSONL or CSV file (picked by extension), flushing each one."""
+
+    def __init__(self, file_path: str) -> None:
+        self.file = open(file_path, "w", newline="")
+        self.csv = None
+        if file_path.lower().endswith(".csv"):
+            self.csv = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, result: Dict) -> None:
+        if self.csv is not None:
+            self.csv.writerow({**result, "steps": json.dumps(result["steps"], ensure_ascii=False)})
+        else:
+            self.file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run many Zelda journeys across a process pool.")
+    parser.add_argument("scenarios", help="JSONL file with one scenario per line")
+    parser.add_argument("--output", default="results.jsonl", help="results file, .jsonl or .csv (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: %(default)s)")
+    parser.add_argument("--cache-dir", default="../Datasets/cache", help="grid cache directory (default: %(default)s)")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios)
+    writer = ResultWriter(args.output)
+    start = time.perf_counter()
+    failed = 0
+    try:
+        for result in run_batch(scenarios, DEFAULT_MAP_FILES, workers=args.workers, cache_dir=args.cache_dir):
+            writer.write(result)
+            failed += result["error"] is not None
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Ran {len(scenarios)} scenarios ({failed} failed) in {elapsed:.2f}s "
+          f"with {args.workers} workers: {len(scenarios) / elapsed:.1f} scenarios/s")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
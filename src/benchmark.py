@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from draw_path import PathPainter, render_paths
+from graph import Graph
+from grid_graph import GridGraph
+from load_graphs import load_all_graphs
+from map_generator import DEFAULT_MIX, generate_world, parse_mix, world_dungeons
+from path_cache import PathCache
+from search_stats import SearchStats
+from zelda_journey import ZeldaJourney
+
+
+# Metrics compared against a baseline, where larger is worse.
+REGRESSION_METRICS = ("seconds", "peak_bytes", "expanded")
+
+
+def _peak_rss() -> Optional[int]:
+    """Return the peak resident set size of the process in bytes, from /proc (Linux only)."""
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the peak resident set size to the current one; tell whether it worked."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure(function: Callable[[], Any], memory: str) -> Tuple[Any, float, Optional[int]]:
+    """Run function and return its result, the seconds it took and its peak memory in bytes.
+
+    Parameters:
+    - memory: "rss" for the peak resident set size of the process while the
+      function ran (Linux only, no overhead), "tracemalloc" for the peak of the
+      allocations traced by Python (slows Python code down, so its timings are
+      not comparable with the other modes), or "none".
+
+    Returns:
+    - The peak is None when it could not be measured.
+    """
+    track = memory == "tracemalloc"
+    reset = memory == "rss" and _reset_peak_rss()
+    if track:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = function()
+        seconds = time.perf_counter() - start
+        if track:
+            peak = tracemalloc.get_traced_memory()[1]
+        else:
+            peak = _peak_rss() if reset else None
+    finally:
+        if track:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark_size(size: int, args: argparse.Namespace, work_dir: str) -> List[Dict]:
+    """Run every stage on a generated world of size x size cells and return one record per stage.
+
+    Above args.max_search_size only the generation and build stages run.
+    """
+    records = []
+
+    def record(stage: str, seconds: float, peak: Optional[int], **extra) -> None:
+        records.append({"size": size, "stage": stage, "seconds": round(seconds, 6), "peak_bytes": peak, **extra})
+        print(f"{size:>6} {stage:<28} {seconds:>10.4f}s"
+              + (f" {peak / 2 ** 20:>9.1f} MiB" if peak is not None else "")
+              + "".join(f" {key}={value}" for key, value in extra.items()))
+
+    map_files, seconds, peak = measure(
+        lambda: generate_world(os.path.join(work_dir, f"world_{size}"), size, args.dungeons, args.mix, args.seed),
+        args.memory)
+    record("generate", seconds, peak)
+
+    graphs_info, seconds, peak = measure(lambda: load_all_graphs(map_files, graph_class=GridGraph), args.memory)
+    main_graph = graphs_info["main"]["graph"]
+    record("build", seconds, peak, nodes=main_graph.num_nodes, edges=main_graph.num_edges)
+    if size <= args.dict_graph_max_size:
+        _, seconds, peak = measure(lambda: load_all_graphs(map_files, graph_class=Graph), args.memory)
+        record("build_dict_graph", seconds, peak)
+
+    if size > args.max_search_size:
+        return records
+
+    # Random endpoints drawn from the cost grid, without listing every node.
+    rng = np.random.default_rng(args.seed)
+    passable = np.flatnonzero(main_graph.cost)
+    endpoints = [main_graph.pixel(int(index)) for index in rng.choice(passable, size=2 * args.queries)]
+    queries = list(zip(endpoints[::2], endpoints[1::2]))
+    for search in args.searches:
+        stats = SearchStats()
+        find = getattr(main_graph, search)
+        _, seconds, peak = measure(
+            lambda: [find(source, [target], args.heuristic, stats) for source, target in queries], args.memory)
+        record(f"query:{search}", seconds, peak, searches=stats.searches, expanded=stats.expanded, pushed=stats.pushed,
+               stale=stats.stale, peak_open=stats.peak_open)
+
+    journey = ZeldaJourney(graphs_info, world_dungeons(args.dungeons), heuristic=args.heuristic, path_cache=PathCache())
+    _, seconds, peak = measure(journey.run, args.memory)
+    record("journey", seconds, peak, total_cost=journey.total_cost, path_length=len(journey.full_path))
+
+    # The same journey streamed to a path painter, without keeping its paths.
+    painter = PathPainter({name: info["graph"].colors() for name, info in graphs_info.items()})
+    streamed = ZeldaJourney(graphs_info, world_dungeons(args.dungeons), heuristic=args.heuristic, path_cache=PathCache())
+    _, seconds, peak = measure(lambda: streamed.run(sink=painter), args.memory)
+    record("journey:stream", seconds, peak, total_cost=streamed.total_cost, path_length=streamed.path_length)
+
+    _, seconds, peak = measure(
+        lambda: render_paths(journey.steps, {name: info["graph"].colors() for name, info in graphs_info.items()}),
+        args.memory)
+    record("render", seconds, peak)
+    return records
+
+
+def environment() -> Dict:
+    """Describe the commit and machine the benchmark ran on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def find_regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Compare two benchmark documents stage by stage.
+
+    Returns:
+    - One message per metric of REGRESSION_METRICS that grew by more than
+      tolerance (a fraction) over the baseline.
+    """
+    previous = {(r["size"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for current in results["results"]:
+        before = previous.get((current["size"], current["stage"]))
+        if before is None:
+            continue
+        for metric in REGRESSION_METRICS:
+            old, new = before.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append(
+                    f"{current['stage']} at {current['size']}: {metric} {old} -> {new} (+{(new / max(old, 1e-9) - 1):.0%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark graph build, queries, journeys and rendering on synthetic maps.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024],
+                        help="overworld widths/heights to run, e.g. 64 256 1024 8192")
+    parser.add_argument("--dungeons", type=int, default=3)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help='terrain mix, e.g. "G=0.5,F=0.2,M=0.3"')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=10, help="random point-to-point queries per size")
+    parser.add_argument("--searches", nargs="+", default=["a_star", "bidirectional_a_star"],
+                        help="Graph search methods to time on the queries")
+    parser.add_argument("--heuristic", default=None)
+    parser.add_argument("--max-search-size", type=int, default=2048,
+                        help="largest size on which queries, journeys and rendering run")
+    parser.add_argument("--dict-graph-max-size", type=int, default=256,
+                        help="largest size also built as a dict-of-dicts Graph")
+    parser.add_argument("--memory", choices=["rss", "tracemalloc", "none"], default="rss",
+                        help="how to measure peak memory (see measure)")
+    parser.add_argument("--work-dir", default=None, help="folder for the generated maps (default: a temporary one)")
+    parser.add_argument("--output", default=None, help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline, as a fraction")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        work_dir = args.work_dir or temporary_dir
+        records = []
+        for size in args.sizes:
+            records.extend(benchmark_size(size, args, work_dir))
+
+    results = {
+        "environment": environment(),
+        "parameters": {
+            "dungeons": args.dungeons, "mix": args.mix, "seed": args.seed, "queries": args.queries,
+            "heuristic": args.heuristic, "memory": args.memory
+        },
+        "results": records,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if baseline.get("parameters") != results["parameters"]:
+            print("Warning: the baseline was run with different parameters")
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
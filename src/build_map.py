@@ -1,7 +1,68 @@
+from typing import List
+
+import numpy as np
 from colors import Colors
 from PIL import Image
 
 
+# Lookup table from character code to RGB color; unmapped characters are black.
+CHAR_COLOR_TABLE = np.zeros((256, 3), dtype=np.uint8)
+for _char, _color in Colors.char_to_color.items():
+    CHAR_COLOR_TABLE[ord(_char)] = _color
+
+
+def read_map_chars(file_path: str) -> np.ndarray:
+    """Reads a text map into a 2D array of character codes.
+
+    Parameters:
+    - file_path: Path to the input text file containing the map characters.
+
+    Returns:
+    - Array of shape (height, width) holding the code point of each character.
+      Rows shorter than the first one are padded with unmapped characters.
+
+    Raises:
+    - ValueError: If a row is longer than the first one.
+    """
+    with open(file_path, 'r') as file:
+        lines = [line.strip() for line in file.readlines()]
+
+    return lines_to_chars(lines, len(lines[0]))
+
+
+def lines_to_chars(lines: List[str], width: int) -> np.ndarray:
+    """Converts stripped map rows into a 2D array of character codes.
+
+    Parameters:
+    - lines: Map rows, without line terminators.
+    - width: Map width; shorter rows are padded with unmapped characters.
+
+    Returns:
+    - Array of shape (len(lines), width) holding the code point of each character.
+
+    Raises:
+    - ValueError: If a row is longer than width.
+    """
+    for y, line in enumerate(lines):
+        if len(line) > width:
+            raise ValueError(f"Row {y} has {len(line)} characters, expected at most {width}")
+
+    text = ''.join(line.ljust(width, '\0') for line in lines)
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).reshape(len(lines), width)
+
+
+def chars_to_colors(chars: np.ndarray) -> np.ndarray:
+    """Converts an array of character codes into an RGB array using Colors.char_to_color.
+
+    Parameters:
+    - chars: Array of character codes, as returned by read_map_chars.
+
+    Returns:
+    - Array of shape chars.shape + (3,) with the RGB color of each character.
+    """
+    return CHAR_COLOR_TABLE[np.where(chars < 256, chars, 0)]
+
+
 def build_map_from_txt(file_path: str, output_path: str) -> None:
     """Reads a text file representing a map and generates a BMP image based on defined colors.
 
@@ -13,19 +74,12 @@ def build_map_from_txt(file_path: str, output_path: str) -> None:
     - None
     """
     try:
-        # Open the text file and read all lines, stripping whitespace.
-        with open(file_path, 'r') as file:
-            lines = [line.strip() for line in file.readlines()]
+        # Convert the whole character grid into an RGB array in one go.
+        colors = chars_to_colors(read_map_chars(file_path))
 
         # Determine the image dimensions based on the number of lines and line length.
-        height, width = len(lines), len(lines[0])
-
-        # Create a new RGB image with the calculated dimensions.
-        image = Image.new('RGB', (width, height))
-
-        for y, line in enumerate(lines):
-            for x, char in enumerate(line):
-                image.putpixel((x, y), Colors.char_to_color.get(char, (0, 0, 0)))
+        height, width = colors.shape[:2]
+        image = Image.fromarray(colors, 'RGB')
 
         # Save the generated image as BMP.
         image.save(output_path, 'BMP')
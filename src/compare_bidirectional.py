@@ -0,0 +1,71 @@
+import argparse
+import random
+import time
+from typing import Dict
+
+import numpy as np
+
+from colors import Colors
+from compare_heuristics import path_cost
+from grid_graph import GridGraph
+from load_graphs import load_all_graphs
+from search_stats import SearchStats
+
+
+# Terrains painted on the synthetic maps, walls included.
+SYNTHETIC_TERRAINS = [Colors.GRASS, Colors.SAND, Colors.FOREST, Colors.MOUNTAIN, Colors.WATER, Colors.DUNGEON_WALL]
+
+
+def synthetic_graph(width: int, height: int, seed: int) -> GridGraph:
+    """Build a grass GridGraph covered with random rectangles of other terrains."""
+    rng = np.random.default_rng(seed)
+    colors = np.empty((height, width, 3), dtype=np.uint8)
+    colors[:] = Colors.GRASS
+    for _ in range(width * height // 200):
+        x, y = rng.integers(0, width), rng.integers(0, height)
+        w, h = rng.integers(1, max(2, width // 10)), rng.integers(1, max(2, height // 10))
+        colors[y:y + h, x:x + w] = SYNTHETIC_TERRAINS[rng.integers(len(SYNTHETIC_TERRAINS))]
+    colors[0, 0] = Colors.LINK
+    graph = GridGraph()
+    graph.build_from_colors(colors)
+    return graph
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare bidirectional and unidirectional a_star on point-to-point queries.")
+    parser.add_argument("--queries", type=int, default=50, help="random queries per map")
+    parser.add_argument("--synthetic-size", type=int, default=200, help="width and height of the synthetic maps")
+    parser.add_argument("--synthetic-maps", type=int, default=2)
+    parser.add_argument("--heuristic", default="weighted")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    map_files = {
+        "main": "../Datasets/txt/main_map.txt",
+        **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
+    }
+    graphs: Dict[str, GridGraph] = {
+        name: info["graph"] for name, info in load_all_graphs(map_files, graph_class=GridGraph).items()
+    }
+    for i in range(args.synthetic_maps):
+        graphs[f"synthetic_{i}"] = synthetic_graph(args.synthetic_size, args.synthetic_size, args.seed + i)
+
+    rng = random.Random(args.seed)
+    print(f"{'map':<12} {'a_star':>10} {'bidir':>10} {'ratio':>6} {'a_star s':>9} {'bidir s':>9}")
+    for name, graph in graphs.items():
+        nodes = list(graph.adj)
+        queries = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(args.queries)]
+        results = []
+        for search in (graph.a_star, graph.bidirectional_a_star):
+            stats = SearchStats()
+            start = time.perf_counter()
+            costs = [path_cost(graph, search(source, [target], args.heuristic, stats)) for source, target in queries]
+            results.append((stats.expanded, time.perf_counter() - start, costs))
+        (uni, uni_time, uni_costs), (bi, bi_time, bi_costs) = results
+        if uni_costs != bi_costs:
+            raise AssertionError(f"Bidirectional search returned different costs on {name!r}")
+        print(f"{name:<12} {uni:>10} {bi:>10} {bi / max(uni, 1):>6.2f} {uni_time:>9.3f} {bi_time:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
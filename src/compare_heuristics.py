@@ -0,0 +1,79 @@
+import argparse
+import random
+import time
+from typing import Dict, List, Tuple
+
+from grid_graph import GridGraph
+from heuristics import HEURISTICS
+from load_graphs import load_all_graphs
+from search_stats import SearchStats
+
+
+def build_queries(graphs_info: Dict[str, Dict], random_queries: int, goals_per_query: int, seed: int) -> List[Tuple]:
+    """Build the (map name, source, destinations) queries to compare heuristics on.
+
+    Every map contributes its source towards each destination and towards all
+    destinations at once, plus random queries with goals_per_query random goals.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for name, info in graphs_info.items():
+        for destination in info["destinations"]:
+            if destination != info["source"]:
+                queries.append((name, info["source"], [destination]))
+        queries.append((name, info["source"], info["destinations"]))
+
+        nodes = list(info["graph"].adj)
+        for _ in range(random_queries):
+            source = rng.choice(nodes)
+            queries.append((name, source, rng.sample(nodes, min(goals_per_query, len(nodes)))))
+    return queries
+
+
+def path_cost(graph, path) -> int:
+    return sum(graph.adj[u][v] for u, v in zip(path[:-1], path[1:]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare a_star heuristics on node expansions.")
+    parser.add_argument("--random-queries", type=int, default=20, help="random queries per map")
+    parser.add_argument("--goals", type=int, default=100, help="goals per random query")
+    parser.add_argument("--landmarks", type=int, default=8, help="landmarks per map for the alt heuristic")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    map_files = {
+        "main": "../Datasets/txt/main_map.txt",
+        **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
+    }
+    graphs_info = load_all_graphs(map_files, graph_class=GridGraph)
+    for info in graphs_info.values():
+        info["graph"].build_landmarks(args.landmarks)
+        info["graph"].build_rectangles()
+    queries = build_queries(graphs_info, args.random_queries, args.goals, args.seed)
+
+    reference_costs = None
+    print(f"{len(queries)} queries")
+    print(f"{'heuristic':<10} {'expanded':>10} {'pushed':>10} {'seconds':>9}")
+    # Every heuristic with plain a_star, then rectangular symmetry reduction.
+    runs = [(name, heuristic, "a_star") for name, heuristic in HEURISTICS.items()]
+    runs.append(("rsr", "weighted", "rsr_a_star"))
+    for name, heuristic, search in runs:
+        stats = SearchStats()
+        costs = []
+        start = time.perf_counter()
+        for map_name, source, destinations in queries:
+            graph = graphs_info[map_name]["graph"]
+            path = getattr(graph, search)(source, destinations, heuristic=heuristic, stats=stats)
+            costs.append(path_cost(graph, path))
+        elapsed = time.perf_counter() - start
+
+        if reference_costs is None:
+            reference_costs = costs
+        elif costs != reference_costs:
+            raise AssertionError(f"Heuristic {name!r} returned suboptimal paths")
+        print(f"{name:<10} {stats.expanded:>10} {stats.pushed:>10} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
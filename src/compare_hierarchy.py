@@ -0,0 +1,56 @@
+import argparse
+import time
+
+from compare_heuristics import build_queries, path_cost
+from grid_graph import GridGraph
+from load_graphs import load_all_graphs
+from search_stats import SearchStats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare hierarchical (HPA*) and flat a_star on cost and speed.")
+    parser.add_argument("--random-queries", type=int, default=20, help="random queries per map")
+    parser.add_argument("--goals", type=int, default=1, help="goals per random query")
+    parser.add_argument("--cluster-size", type=int, default=8)
+    parser.add_argument("--heuristic", default="weighted")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    map_files = {
+        "main": "../Datasets/txt/main_map.txt",
+        **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
+    }
+    graphs_info = load_all_graphs(map_files, graph_class=GridGraph)
+    queries = build_queries(graphs_info, args.random_queries, args.goals, args.seed)
+
+    print(f"{len(queries)} queries")
+    print(f"{'search':<10} {'build s':>8} {'expanded':>10} {'seconds':>9} {'mean cost':>10} {'worst cost':>11}")
+    flat_costs = None
+    for name, exact in (("flat", None), ("hpa", False), ("hpa-exact", True)):
+        build = 0.0
+        if exact is not None:
+            start = time.perf_counter()
+            for info in graphs_info.values():
+                info["graph"].build_hierarchy(args.cluster_size, exact)
+            build = time.perf_counter() - start
+
+        stats = SearchStats()
+        costs = []
+        start = time.perf_counter()
+        for map_name, source, destinations in queries:
+            graph = graphs_info[map_name]["graph"]
+            search = graph.a_star if exact is None else graph.hpa_a_star
+            costs.append(path_cost(graph, search(source, destinations, heuristic=args.heuristic, stats=stats)))
+        elapsed = time.perf_counter() - start
+
+        if flat_costs is None:
+            flat_costs = costs
+        # Path quality as the ratio to the flat (optimal) cost.
+        ratios = [cost / flat for cost, flat in zip(costs, flat_costs) if flat]
+        mean = sum(ratios) / len(ratios) if ratios else 1.0
+        worst = max(ratios, default=1.0)
+        print(f"{name:<10} {build:>8.3f} {stats.expanded:>10} {elapsed:>9.3f} {mean:>10.3f} {worst:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+
+from colors import Colors
+from grid_graph import GridGraph
+from load_graphs import load_all_graphs
+from zelda_journey import ZeldaJourney
+
+
+# Terrain weights of a few unit types, on top of COLOR_WEIGHTS.
+PROFILES = {
+    "walker": {},
+    "swimmer": {Colors.WATER: 20},
+    "climber": {Colors.MOUNTAIN: 30, Colors.FOREST: 60},
+    "mounted": {Colors.GRASS: 5, Colors.SAND: 10, Colors.FOREST: 0},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the journey under several terrain cost profiles of the same loaded maps.")
+    parser.add_argument("--strategy", choices=ZeldaJourney.STRATEGIES, default="greedy")
+    args = parser.parse_args()
+
+    map_files = {
+        "main": "../Datasets/txt/main_map.txt",
+        **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
+    }
+    graphs_info = load_all_graphs(map_files, graph_class=GridGraph)
+    dungeons = {
+        Colors.DUNGEON1: "dungeon_0",
+        Colors.DUNGEON2: "dungeon_1",
+        Colors.DUNGEON3: "dungeon_2",
+    }
+    terrain_bytes = sum(info["graph"].terrain.nbytes for info in graphs_info.values())
+    print(f"Terrain grids: {terrain_bytes} bytes, shared by every profile")
+
+    print(f"{'profile':<10} {'edges':>8} {'total cost':>11} {'path length':>12} {'table bytes':>12}")
+    for name, weights in PROFILES.items():
+        # Each profile only adds its cost tables; the terrain grids are the loaded ones.
+        profile_info = {
+            map_name: {**info, "graph": info["graph"].with_costs(weights)}
+            for map_name, info in graphs_info.items()
+        }
+        journey = ZeldaJourney(profile_info, dungeons, strategy=args.strategy)
+        try:
+            journey.run()
+        except ValueError as error:
+            print(f"{name:<10} {error}")
+            continue
+        main_graph = profile_info["main"]["graph"]
+        table_bytes = sum(info["graph"].table.nbytes for info in profile_info.values())
+        print(f"{name:<10} {main_graph.num_edges:>8} {journey.total_cost:>11} "
+              f"{len(journey.full_path):>12} {table_bytes:>12}")
+
+
+if __name__ == "__main__":
+    main()
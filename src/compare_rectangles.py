@@ -0,0 +1,65 @@
+import argparse
+import random
+import time
+from typing import Dict, Tuple
+
+from build_map import chars_to_colors
+from compare_heuristics import path_cost
+from grid_graph import GridGraph
+from load_graphs import load_all_graphs
+from map_generator import generate_overworld
+from search_stats import SearchStats
+
+
+def generated_graph(size: int, region_size: int, noise: float, seed: int) -> GridGraph:
+    """Build a GridGraph from a generated size x size overworld."""
+    graph = GridGraph()
+    graph.build_from_colors(chars_to_colors(generate_overworld(size, size, seed=seed, region_size=region_size, noise=noise)))
+    return graph
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare rectangular symmetry reduction (rsr_a_star) and a_star on the bundled and generated maps.")
+    parser.add_argument("--queries", type=int, default=20, help="random queries per map")
+    parser.add_argument("--size", type=int, default=256, help="width and height of the generated maps")
+    parser.add_argument("--heuristic", default="weighted")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    map_files = {
+        "main": "../Datasets/txt/main_map.txt",
+        **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
+    }
+    graphs: Dict[str, GridGraph] = {
+        name: info["graph"] for name, info in load_all_graphs(map_files, graph_class=GridGraph).items()
+    }
+    # Generated overworlds from noisy small regions (like main_map.txt) to large uniform ones.
+    variants: Tuple[Tuple[int, float], ...] = ((8, 0.1), (32, 0.1), (32, 0.0), (128, 0.0))
+    for region_size, noise in variants:
+        graphs[f"gen_{region_size}_{noise:g}"] = generated_graph(args.size, region_size, noise, args.seed)
+
+    rng = random.Random(args.seed)
+    print(f"{'map':<12} {'rects':>6} {'build s':>8} {'a_star':>10} {'rsr':>10} {'ratio':>6} {'a_star s':>9} {'rsr s':>9}")
+    for name, graph in graphs.items():
+        start = time.perf_counter()
+        rectangles = graph.build_rectangles()
+        build = time.perf_counter() - start
+
+        nodes = list(graph.adj)
+        queries = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(args.queries)]
+        results = []
+        for search in (graph.a_star, graph.rsr_a_star):
+            stats = SearchStats()
+            start = time.perf_counter()
+            costs = [path_cost(graph, search(source, [target], args.heuristic, stats)) for source, target in queries]
+            results.append((stats.expanded, time.perf_counter() - start, costs))
+        (flat, flat_time, flat_costs), (rsr, rsr_time, rsr_costs) = results
+        if flat_costs != rsr_costs:
+            raise AssertionError(f"rsr_a_star returned different costs on {name!r}")
+        print(f"{name:<12} {len(rectangles.rectangles):>6} {build:>8.3f} {flat:>10} {rsr:>10} "
+              f"{rsr / max(flat, 1):>6.2f} {flat_time:>9.3f} {rsr_time:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
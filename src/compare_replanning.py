@@ -0,0 +1,80 @@
+import argparse
+import random
+
+from colors import Colors
+from compare_heuristics import path_cost
+from grid_graph import GridGraph
+from load_graphs import load_all_graphs
+from replanning import JourneyReplanner
+from search_stats import SearchStats
+from zelda_journey import ZeldaJourney
+
+
+# Terrains a cell may turn into: a burnt forest, a bridge, frozen water, a rockslide...
+NEW_TERRAINS = [Colors.GRASS, Colors.SAND, Colors.FOREST, Colors.MOUNTAIN, Colors.WATER, Colors.DUNGEON_WALL]
+
+# Cells that never change: the start, the targets and the dungeon entrances.
+FIXED_COLORS = [
+    Colors.LINK, Colors.MASTER_SWORD, Colors.DUNGEON1, Colors.DUNGEON2, Colors.DUNGEON3,
+    Colors.PENDANT, Colors.DUNGEON_ENTRANCE
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare LPA* journey repairs with replanning every leg from scratch.")
+    parser.add_argument("--rounds", type=int, default=20, help="rounds of terrain changes")
+    parser.add_argument("--cells", type=int, default=3, help="cells changed per round")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    map_files = {
+        "main": "../Datasets/txt/main_map.txt",
+        **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
+    }
+    graphs_info = load_all_graphs(map_files, graph_class=GridGraph)
+    dungeons = {
+        Colors.DUNGEON1: "dungeon_0",
+        Colors.DUNGEON2: "dungeon_1",
+        Colors.DUNGEON3: "dungeon_2",
+    }
+    journey = ZeldaJourney(graphs_info, dungeons)
+    journey.run()
+    initial = SearchStats()
+    replanner = JourneyReplanner(journey, stats=initial)
+
+    rng = random.Random(args.seed)
+    repair = SearchStats()
+    replan = SearchStats()
+    skipped = 0
+    for _ in range(args.rounds):
+        # Change cells on the current route of one map, where they matter.
+        map_name = rng.choice(sorted({step["Map"] for step in journey.steps}))
+        graph = graphs_info[map_name]["graph"]
+        route = [
+            pixel for step in journey.steps if step["Map"] == map_name
+            for pixel in step["Path"] if graph.color_at(pixel) not in FIXED_COLORS
+        ]
+        changes = {pixel: rng.choice(NEW_TERRAINS) for pixel in rng.sample(route, min(args.cells, len(route)))}
+        previous = {pixel: graph.color_at(pixel) for pixel in changes}
+        touched = graph.set_terrain(changes)
+        try:
+            replanner.repair({map_name: touched}, stats=repair)
+        except ValueError:
+            # The changes cut a leg off; undo them (the undo is a repair too).
+            skipped += 1
+            replanner.repair({map_name: graph.set_terrain(previous)}, stats=repair)
+
+        for step in journey.steps:
+            if step["Map"] == map_name:
+                path = graph.a_star(step["Path"][0], [step["Path"][-1]], stats=replan)
+                if path_cost(graph, path) != step["IncrementalCost"]:
+                    raise AssertionError(f"Repair of {step['Action']!r} is not optimal")
+
+    print(f"{'search':<16} {'searches':>9} {'expanded':>10} {'pushed':>10}")
+    for name, stats in (("initial LPA*", initial), ("LPA* repairs", repair), ("full replans", replan)):
+        print(f"{name:<16} {stats.searches:>9} {stats.expanded:>10} {stats.pushed:>10}")
+    print(f"Journey cost after the changes: {journey.total_cost} ({skipped} rounds undone)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import heapq
+
+import numpy as np
+
+
+# Next-hop codes: the move (dx, dy) towards the target, by code.
+MOVES = ((1, 0), (-1, 0), (0, 1), (0, -1))
+# Next-hop code of the target itself, and of the cells that cannot reach it.
+AT_TARGET = len(MOVES)
+NO_HOP = np.iinfo(np.uint8).max
+
+
+class DistanceFields:
+    """Exact cost and next step from every cell to a few fixed target pixels.
+
+    Each field is filled by one Dijkstra sweep from its target. Grid edges weigh
+    the same both ways, so that is also the reverse search towards the target.
+    Any "from anywhere to target" query then walks the next-hop grid, in time
+    proportional to the length of the path, without searching.
+
+    A field holds a distance grid (uint32, or uint64 on maps where costs
+    overflow it) and a uint8 next-hop grid, both flat and indexed like the
+    GridGraph cost grid. Fields loaded from a file are only read when their
+    target is first queried.
+
+    Parameters:
+    - graph: The GridGraph the fields were built on.
+    - fields: (distance, next_hop) grids by target pixel.
+    - fingerprint: GridGraph.fingerprint() of graph.
+    - file_path: File with the fields that are not in memory yet (see load()).
+    - targets: Every target with a field, in memory or in file_path; defaults to
+      the keys of fields.
+    """
+
+    def __init__(
+        self,
+        graph,
+        fields: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]],
+        fingerprint: str,
+        file_path: Optional[str] = None,
+        targets: Optional[List[Tuple[int, int]]] = None
+    ) -> None:
+        self.graph = graph
+        self.fields = fields
+        self.fingerprint = fingerprint
+        self.file_path = file_path
+        self.targets = list(fields) if targets is None else targets
+        # The fields only hold for this version of the graph.
+        self.version = graph.version
+
+    @classmethod
+    def build(cls, graph, targets: Iterable[Tuple[int, int]]) -> "DistanceFields":
+        """Run one sweep per target and keep its distance and next-hop grids.
+
+        Parameters:
+        - graph: The GridGraph to preprocess.
+        - targets: The target pixels; duplicates are ignored.
+
+        Returns:
+        - The DistanceFields of the graph.
+        """
+        fields = {target: _sweep(graph, target) for target in dict.fromkeys(targets)}
+        return cls(graph, fields, graph.fingerprint())
+
+    def field(self, target: Tuple[int, int]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Return the (distance, next_hop) grids of target, reading them from the file on first use.
+
+        Returns:
+        - None when target has no field.
+        """
+        field = self.fields.get(target)
+        if field is None and self.file_path is not None and target in self.targets:
+            key = self.targets.index(target)
+            with np.load(self.file_path) as data:
+                field = self.fields[target] = (data[f"distance_{key}"], data[f"next_hop_{key}"])
+        return field
+
+    def cost(self, source: Tuple[int, int], target: Tuple[int, int]) -> float:
+        """Return the cost of a shortest path from source to target (infinity when there is none).
+
+        Raises:
+        - KeyError: If target has no field.
+        """
+        field = self.field(target)
+        if field is None:
+            raise KeyError(f"No distance field for {target}")
+        distance, next_hop = field
+        index = self.graph.index(source)
+        if next_hop[index] == NO_HOP:
+            return float('inf')
+        return int(distance[index])
+
+    def path(self, source: Tuple[int, int], target: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Follow the next-hop grid of target from source.
+
+        Returns:
+        - The shortest path from source to target, or an empty list when target
+          is unreachable.
+
+        Raises:
+        - KeyError: If target has no field.
+        """
+        field = self.field(target)
+        if field is None:
+            raise KeyError(f"No distance field for {target}")
+        next_hop = field[1]
+        width = self.graph.width
+        offsets = [dx + dy * width for dx, dy in MOVES]
+        index = self.graph.index(source)
+        hop = int(next_hop[index])
+        if hop == NO_HOP:
+            return []
+        path = [source]
+        while hop != AT_TARGET:
+            index += offsets[hop]
+            path.append(self.graph.pixel(index))
+            hop = int(next_hop[index])
+        return path
+
+    def save(self, file_path: str) -> None:
+        """Write every field to an uncompressed .npz file, one pair of arrays per target."""
+        grids = {}
+        for key, target in enumerate(self.targets):
+            grids[f"distance_{key}"], grids[f"next_hop_{key}"] = self.field(target)
+        np.savez(
+            file_path,
+            targets=np.array(self.targets, dtype=np.int64).reshape(-1, 2),
+            fingerprint=np.array(self.fingerprint),
+            **grids
+        )
+
+    @classmethod
+    def load(cls, file_path: str, graph) -> "DistanceFields":
+        """Open fields saved by save() for graph; the grids are read lazily, per target.
+
+        Raises:
+        - ValueError: If the fields were built for a different graph.
+        """
+        with np.load(file_path) as data:
+            fingerprint = str(data["fingerprint"])
+            if fingerprint != graph.fingerprint():
+                raise ValueError(f"Distance fields in {file_path} were built for a different graph")
+            targets = [(int(x), int(y)) for x, y in data["targets"]]
+        return cls(graph, {}, fingerprint, file_path, targets)
+
+
+def _sweep(graph, target: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Dijkstra from target over the flat cost grid; return its distance and next-hop grids.
+
+    The tentative distances and next hops live in flat buffers indexed by
+    cell, 9 bytes per cell, rather than in dicts keyed by cell.
+    """
+    width, height = graph.width, graph.height
+    size = width * height
+    # Native-order view, so indexing yields plain ints without copying the grid.
+    cost = memoryview(np.ascontiguousarray(graph.cost, dtype=np.uint16))
+    start = graph.index(target)
+    unreached = np.iinfo(np.uint64).max
+    best = array("Q", [unreached]) * size
+    hops = bytearray([NO_HOP]) * size
+    best[start] = 0
+    hops[start] = AT_TARGET
+    open_set = [(0, start)]
+    while open_set:
+        d, i = heapq.heappop(open_set)
+        if d > best[i]:
+            # Superseded by a cheaper push of the same cell.
+            continue
+        x = i % width
+        # Neighbor j steps towards i with move code hop; the edge weighs the
+        # cost of its upper/left endpoint. Settled cells never improve, as
+        # every weight is positive.
+        for j, hop, weight_index, inside in (
+            (i - 1, 0, i - 1, x > 0),
+            (i + 1, 1, i, x + 1 < width),
+            (i - width, 2, i - width, i >= width),
+            (i + width, 3, i, i + width < size),
+        ):
+            if not inside or not cost[j]:
+                continue
+            tentative = d + cost[weight_index]
+            if tentative < best[j]:
+                best[j] = tentative
+                hops[j] = hop
+                heapq.heappush(open_set, (tentative, j))
+
+    next_hop = np.frombuffer(hops, dtype=np.uint8)
+    distance = np.frombuffer(best, dtype=np.uint64)
+    reached = next_hop != NO_HOP
+    if distance[reached].max(initial=0) < np.iinfo(np.uint32).max:
+        distance = np.where(reached, distance, np.iinfo(np.uint32).max).astype(np.uint32)
+    return distance, next_hop
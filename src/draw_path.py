@@ -1,70 +1,197 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 import os
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
 
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image
 
+from build_map import chars_to_colors, read_map_chars
 from colors import Colors
+from grid_graph import pack_colors
 
 
-def draw_path(journey_steps: List[Dict], output_folder: str) -> None:
-    # Create output directory if it doesn't exist.
-    os.makedirs(output_folder, exist_ok=True)
+# Text maps drawn on when no graphs are given.
+MAP_PATHS = {
+    "main": "../Datasets/txt/main_map.txt",
+    "dungeon_0": "../Datasets/txt/dungeon_0.txt",
+    "dungeon_1": "../Datasets/txt/dungeon_1.txt",
+    "dungeon_2": "../Datasets/txt/dungeon_2.txt"
+}
+
+# Pixels keeping their own color under the path.
+SPECIAL_COLORS = [
+    Colors.LINK,
+    Colors.DUNGEON1,
+    Colors.DUNGEON2,
+    Colors.DUNGEON3,
+    Colors.MASTER_SWORD,
+    Colors.PENDANT
+]
+_SPECIAL_PACKED = pack_colors(np.array(SPECIAL_COLORS, dtype=np.uint8))
+
+
+def _map_key(step: Dict) -> Optional[str]:
+    """Return the map a step was walked on, guessing from its action for steps without a "Map"."""
+    if "Map" in step:
+        return step["Map"]
+    action = step["Action"]
+    if "Overworld" in action or "Master Sword" in action:
+        return "main"
+    for name in ("dungeon_0", "dungeon_1", "dungeon_2"):
+        if name in action.lower():
+            return name
+    return None
+
+
+def _mark_path(mask: np.ndarray, path) -> int:
+    """Set the cells of a path (pixel list or EncodedPath) in a (height, width) mask.
+
+    Returns:
+        The number of cells outside the map, which are skipped.
+    """
+    cells = np.asarray(path, dtype=np.intp).reshape(-1, 2)
+    height, width = mask.shape
+    xs, ys = cells[:, 0], cells[:, 1]
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    mask[ys[inside], xs[inside]] = True
+    return len(cells) - int(np.count_nonzero(inside))
+
+
+def _paint_mask(colors: np.ndarray, mask: np.ndarray) -> None:
+    """Paint the masked cells in Colors.PATH, except special points, in place."""
+    mask &= ~np.isin(pack_colors(colors), _SPECIAL_PACKED)
+    colors[mask] = Colors.PATH
+
+
+def paint_paths(colors: np.ndarray, paths: List[List]) -> None:
+    """Paint the cells of paths in Colors.PATH on a (height, width, 3) color array, in place.
+
+    Special points (see SPECIAL_COLORS) keep their color, and cells outside the
+    map are reported and skipped.
+    """
+    if not paths:
+        return
+    height, width = colors.shape[:2]
+    mask = np.zeros((height, width), dtype=bool)
+    outside = sum(_mark_path(mask, path) for path in paths)
+    if outside:
+        print(f"Warning: {outside} path cells outside the {width}x{height} map were skipped")
+    _paint_mask(colors, mask)
+
+
+class PathPainter:
+    """ZeldaJourney.run() sink that collects the cells walked on each map.
+
+    Each step only sets the cells of its path in a boolean mask of its map, so
+    memory does not depend on the length of the journey; images() paints all
+    the masks at once.
+
+    Parameters:
+        map_colors: (height, width, 3) color array of each map, such as
+            Graph.colors(); painted in place by images()
+    """
+
+    def __init__(self, map_colors: Dict[str, np.ndarray]) -> None:
+        self.map_colors = map_colors
+        self.masks = {name: np.zeros(colors.shape[:2], dtype=bool) for name, colors in map_colors.items()}
+        self.outside = dict.fromkeys(map_colors, 0)
+
+    def __call__(self, step: Dict) -> None:
+        name = _map_key(step)
+        if name in self.masks:
+            self.outside[name] += _mark_path(self.masks[name], step["Path"])
 
-    # Define map paths.
-    map_paths = {
-        "main": "../Datasets/bmp/main_map.bmp",
-        "dungeon_0": "../Datasets/bmp/dungeon_0.bmp",
-        "dungeon_1": "../Datasets/bmp/dungeon_1.bmp",
-        "dungeon_2": "../Datasets/bmp/dungeon_2.bmp"
-    }
-
-    # Carregar imagens.
-    images = {
-        name: Image.open(path).convert("RGB")
-        for name, path in map_paths.items()
-    }
-
-    # Create drawing objects for each image.
-    draws = {
-        name: ImageDraw.Draw(img)
-        for name, img in images.items()
-    }
-
-    # Draw each path segment on the appropriate map.
+    def images(self) -> Dict[str, Image.Image]:
+        """Paint the collected cells and return an RGB image per map name."""
+        images = {}
+        for name, colors in self.map_colors.items():
+            if self.outside[name]:
+                height, width = colors.shape[:2]
+                print(f"Warning: {self.outside[name]} path cells outside the {width}x{height} map were skipped")
+            _paint_mask(colors, self.masks[name])
+            images[name] = Image.fromarray(colors, 'RGB')
+        return images
+
+
+def render_paths(journey_steps: Iterable[Dict], map_colors: Dict[str, np.ndarray]) -> Dict[str, Image.Image]:
+    """Draw the journey on in-memory maps.
+
+    Parameters:
+        journey_steps: ZeldaJourney.steps, or any iterable of steps
+        map_colors: (height, width, 3) color array of each map, such as
+            Graph.colors(); painted in place
+
+    Returns:
+        An RGB image per map name, with all its path cells painted at once.
+    """
+    painter = PathPainter(map_colors)
     for step in journey_steps:
-        path = step["Path"]
-        action = step["Action"]
-
-        # Determine which map to draw on based on the action description.
-        if "Overworld" in action or "Master Sword" in action:
-            map_key = "main"
-        elif "dungeon_0" in action.lower():
-            map_key = "dungeon_0"
-        elif "dungeon_1" in action.lower():
-            map_key = "dungeon_1"
-        elif "dungeon_2" in action.lower():
-            map_key = "dungeon_2"
-        else:
-            continue
-
-        # Draw each point in the path.
-        for x, y in path:
-            try:
-                if images[map_key].getpixel((x ,y)) not in [
-                    Colors.LINK, 
-                    Colors.DUNGEON1, 
-                    Colors.DUNGEON2, 
-                    Colors.DUNGEON3, 
-                    Colors.MASTER_SWORD, 
-                    Colors.PENDANT
-                ]:
-                    # Draw the path point only if it's not already a special color.
-                    draws[map_key].point((x, y), fill=Colors.PATH)
-            except ValueError as e:
-                print(f"Warning: Invalid coordinates ({x}, {y}) in {action}: {e}")
-
-    # Save all modified images.
+        painter(step)
+    return painter.images()
+
+
+def save_images(images: Dict[str, Image.Image], output_folder: str) -> List[str]:
+    """Save each map image as <map>_path.bmp in output_folder.
+
+    Returns:
+        The paths of the saved files, to pass to report_saved().
+    """
+    # Create output directory if it doesn't exist.
+    os.makedirs(output_folder, exist_ok=True)
+    saved = []
     for name, img in images.items():
         output_path = os.path.join(output_folder, f"{name}_path.bmp")
         img.save(output_path)
+        saved.append(output_path)
+    return saved
+
+
+def report_saved(saved: List[str]) -> None:
+    """Print the files written by save_images()."""
+    for output_path in saved:
         print(f"Saved path visualization: {output_path}")
+
+
+def draw_path(
+    journey_steps: List[Dict],
+    output_folder: str,
+    graphs_info: Optional[Dict[str, Dict]] = None,
+    background: bool = False
+) -> Optional["Future[List[str]]"]:
+    """Save a copy of every map with the journey's path drawn on it.
+
+    Parameters:
+        journey_steps: ZeldaJourney.steps
+        output_folder: Folder receiving one <map>_path.bmp per map
+        graphs_info: Loaded graphs to draw on; without them the text maps of
+            MAP_PATHS are read from disk
+        background: Render and save in a new thread instead of blocking. The
+            graphs must not change until the thread finishes.
+
+    Returns:
+        A Future when background is set. The thread prints nothing: its
+        result() is the list of saved files to pass to report_saved(), and
+        re-raises any error raised while rendering or saving.
+    """
+    # Take the paths now, as compact cell arrays, so later changes to the steps
+    # do not leak into the drawing.
+    steps = [
+        {"Map": _map_key(step), "Path": np.asarray(step["Path"], dtype=np.int32).reshape(-1, 2)}
+        for step in journey_steps
+    ]
+
+    def render_and_save() -> List[str]:
+        if graphs_info is None:
+            map_colors = {name: chars_to_colors(read_map_chars(path)) for name, path in MAP_PATHS.items()}
+        else:
+            map_colors = {name: info["graph"].colors() for name, info in graphs_info.items()}
+        return save_images(render_paths(steps, map_colors), output_folder)
+
+    if not background:
+        report_saved(render_and_save())
+        return None
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="draw_path")
+    future = executor.submit(render_and_save)
+    # The worker thread exits once the drawing is done.
+    executor.shutdown(wait=False)
+    return future
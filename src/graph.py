@@ -1,11 +1,105 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 import heapq
+import itertools
 import os
+import time
 
+import numpy as np
 from PIL import Image
 
+from build_map import chars_to_colors, read_map_chars
 from load_image import load_image
 from colors import Colors
+from heuristics import Heuristic, get_heuristic
+from search_stats import SearchStats
+
+
+# Edge weights for each traversable color.
+COLOR_WEIGHTS = {
+    # Terrain Colors.
+    Colors.GRASS: 10,
+    Colors.SAND: 20,
+    Colors.FOREST: 100,
+    Colors.MOUNTAIN: 150,
+    Colors.WATER: 180,
+
+    # Special Points.
+    Colors.LINK: 10,
+    Colors.MASTER_SWORD: 10,
+    Colors.DUNGEON1: 20,
+    Colors.DUNGEON2: 20,
+    Colors.DUNGEON3: 20,
+
+    # Dungeon Features.
+    Colors.PENDANT: 10,
+    Colors.DUNGEON_PATH: 10,
+    Colors.DUNGEON_ENTRANCE: 10
+}
+
+
+# Colors marking the starting point and the targets of a map.
+SOURCE_COLORS = [Colors.LINK, Colors.DUNGEON_ENTRANCE]
+DESTINATION_COLORS = [
+    Colors.MASTER_SWORD,
+    Colors.DUNGEON1,
+    Colors.DUNGEON2,
+    Colors.DUNGEON3,
+    Colors.PENDANT
+]
+
+
+def pack_colors(colors: np.ndarray) -> np.ndarray:
+    """Pack an (..., 3) RGB array into a uint32 array of 0xRRGGBB values."""
+    colors = colors.astype(np.uint32)
+    return (colors[..., 0] << 16) | (colors[..., 1] << 8) | colors[..., 2]
+
+
+def _pack_color(color: Tuple[int, int, int]) -> int:
+    r, g, b = color
+    return (r << 16) | (g << 8) | b
+
+
+def reconstruct_path(came_from: Dict[Any, Any], node: Any) -> List[Any]:
+    """Follow the predecessors in came_from back from node and return the path up to node."""
+    path = [node]
+    while node in came_from:
+        node = came_from[node]
+        path.append(node)
+    path.reverse()
+    return path
+
+
+def record_search(
+    stats: SearchStats,
+    start: float,
+    expanded: int,
+    pushed: int,
+    left_open: int,
+    peak_open: int,
+    goal_pops: int = 0
+) -> None:
+    """Record a finished search, deriving its pops from the entries still open.
+
+    Every pop either expands a node, reaches a goal (goal_pops) or is stale.
+    """
+    popped = pushed - left_open
+    stats.record(
+        expanded=expanded, pushed=pushed, popped=popped, stale=popped - expanded - goal_pops,
+        peak_open=peak_open, seconds=time.perf_counter() - start)
+
+
+def touched_pixels(pixels: Iterable[Tuple[int, int]], width: int, height: int) -> Set[Tuple[int, int]]:
+    """Return pixels together with their 4-neighbors inside a width x height map."""
+    touched = set()
+    for x, y in pixels:
+        for pixel in ((x, y), (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if 0 <= pixel[0] < width and 0 <= pixel[1] < height:
+                touched.add(pixel)
+    return touched
+
+
+# Source of Graph.version numbers, unique across all graphs of the process.
+_graph_versions = itertools.count()
 
 
 class Graph:
@@ -15,6 +109,27 @@ class Graph:
         self.num_edges = 0
         self.adj = {}
         self.image = None
+        # Changes whenever an edge is added or re-weighted, so caches of search
+        # results can tell a rebuilt graph apart.
+        self.version = next(_graph_versions)
+        self._symmetric = (None, True)
+        self._min_weight = (None, 0)
+
+    def _bump_version(self) -> None:
+        """Give the graph a new version number after its edges changed."""
+        self.version = next(_graph_versions)
+
+    def is_symmetric(self) -> bool:
+        """Tell whether every edge u -> v has a reverse edge v -> u of the same weight."""
+        version, symmetric = self._symmetric
+        if version != self.version:
+            symmetric = all(
+                self.adj.get(v, {}).get(u) == weight
+                for u, neighbors in self.adj.items()
+                for v, weight in neighbors.items()
+            )
+            self._symmetric = (self.version, symmetric)
+        return symmetric
 
     def add_node(self, node: Any) -> None:
         """Adds a node to the graph.
@@ -52,6 +167,7 @@ class Graph:
         self.add_node(v)
         self.adj[u][v] = weight
         self.num_edges += 1
+        self._bump_version()
 
     def add_undirected_edge(self, u, v, weight):
         """Add a two-way (undirected) edge between nodes 'u' and 'v' with the specified weight.
@@ -84,32 +200,95 @@ class Graph:
         - destination_pixels: list of target points (dungeons and Master Sword)
         """
         self.image = load_image(image_path)
+        return self._build_from_image()
 
-        source_pixel = None
-        destination_pixels = []
-        width, height = self.image.size
+    def build_graph_from_txt(self, file_path: str) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+        """Build a graph straight from a text map, without writing a bitmap to disk.
+
+        Parameters:
+        - file_path (str): File path of the text map.
+
+        Returns:
+        - The same (source_pixel, destination_pixels) tuple as build_graph.
+        """
+        self.image = Image.fromarray(chars_to_colors(read_map_chars(file_path)), 'RGB')
+        return self._build_from_image()
+
+    def _build_from_image(self) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+        """Add the nodes and edges of every traversable pixel of self.image.
 
-        for x in range(width):
-            for y in range(height):
-                current_pixel = (x, y)
-                pixel_color = self.image.getpixel((x, y))
-                if pixel_color != Colors.DUNGEON_WALL:
-                    if pixel_color == Colors.LINK or pixel_color == Colors.DUNGEON_ENTRANCE:
-                        source_pixel = current_pixel
-                    if pixel_color in [
-                        Colors.MASTER_SWORD,
-                        Colors.DUNGEON1,
-                        Colors.DUNGEON2,
-                        Colors.DUNGEON3,
-                        Colors.PENDANT
-                    ]:
-                        destination_pixels.append(current_pixel)
-                if pixel_color != Colors.DUNGEON_WALL:
-                    self.add_edges_for_pixel(current_pixel, width, height, self.image)
-        if source_pixel is None:
+        The image is decoded into a NumPy array once; walls, weights, edges,
+        source and destination pixels are all derived with array operations.
+        Pixels are scanned column by column (x, then y), hence the transposes.
+
+        Raises:
+        - ValueError: If the image has no source pixel, or a pixel next to a
+          traversable one has an undefined color.
+        """
+        colors = np.asarray(self.image.convert('RGB'))
+        height, width = colors.shape[:2]
+        packed = pack_colors(colors)
+
+        # Every non-wall pixel is traversable; an edge weighs the COLOR_WEIGHTS
+        # entry of its upper/left endpoint.
+        is_open = packed != _pack_color(Colors.DUNGEON_WALL)
+        weights = np.zeros((height, width), dtype=np.int64)
+        unknown = is_open.copy()
+        for color, weight in COLOR_WEIGHTS.items():
+            match = packed == _pack_color(color)
+            weights[match] = weight
+            unknown &= ~match
+
+        # right[y, x] / down[y, x]: an edge joins (x, y) to (x + 1, y) / (x, y + 1).
+        right = np.zeros((height, width), dtype=bool)
+        right[:, :-1] = is_open[:, :-1] & is_open[:, 1:]
+        down = np.zeros((height, width), dtype=bool)
+        down[:-1, :] = is_open[:-1, :] & is_open[1:, :]
+        left = np.zeros((height, width), dtype=bool)
+        left[:, 1:] = right[:, :-1]
+        up = np.zeros((height, width), dtype=bool)
+        up[1:, :] = down[:-1, :]
+
+        bad = unknown & (left | right | up | down)
+        if bad.any():
+            x, y = np.argwhere(bad.T)[0]
+            raise ValueError(f"Unknown color found: {tuple(int(c) for c in colors[y, x])}")
+
+        sources = np.flatnonzero(np.isin(packed.T, [_pack_color(c) for c in SOURCE_COLORS]) & is_open.T)
+        if len(sources) == 0:
             raise ValueError("No source pixel found in the image")
+        destinations = np.flatnonzero(np.isin(packed.T, [_pack_color(c) for c in DESTINATION_COLORS]))
+        source_pixel = divmod(int(sources[-1]), height)
+        destination_pixels = [divmod(int(index), height) for index in destinations]
+
+        # Nodes in scan order, each with its neighbors in left, up, right, down order.
+        xs, ys = np.nonzero((left | right | up | down).T)
+        adj = {(x, y): {} for x, y in zip(xs.tolist(), ys.tolist())}
+        for has_edge, dx, dy, wx, wy in (
+            (left, -1, 0, -1, 0),
+            (up, 0, -1, 0, -1),
+            (right, 1, 0, 0, 0),
+            (down, 0, 1, 0, 0),
+        ):
+            selected = has_edge[ys, xs]
+            ex, ey = xs[selected], ys[selected]
+            for x, y, weight in zip(ex.tolist(), ey.tolist(), weights[ey + wy, ex + wx].tolist()):
+                adj[(x, y)][(x + dx, y + dy)] = weight
+
+        self.adj = adj
+        self.num_nodes = len(adj)
+        self.num_edges = 2 * int(right.sum() + down.sum())
+        self._bump_version()
         return source_pixel, destination_pixels
 
+    def color_at(self, pixel: Tuple[int, int]) -> Tuple[int, int, int]:
+        """Return the map color of a pixel (x, y)."""
+        return self.image.getpixel(pixel)
+
+    def colors(self) -> np.ndarray:
+        """Return a new (height, width, 3) uint8 array with the map color of every pixel."""
+        return np.array(self.image.convert('RGB'))
+
     def add_edges_for_pixel(
         self,
         coordinates: Tuple[int, int],
@@ -130,30 +309,9 @@ class Graph:
         """
         neighbor_coordinates_list = self.get_neighbors(coordinates, width, height, image)
 
-        color_weights = {
-            # Terrain Colors.
-            Colors.GRASS: 10,
-            Colors.SAND: 20,
-            Colors.FOREST: 100,
-            Colors.MOUNTAIN: 150,
-            Colors.WATER: 180,
-
-            # Special Points.
-            Colors.LINK: 10,
-            Colors.MASTER_SWORD: 10,
-            Colors.DUNGEON1: 20,
-            Colors.DUNGEON2: 20,
-            Colors.DUNGEON3: 20,
-
-            # Dungeon Features.
-            Colors.PENDANT: 10,
-            Colors.DUNGEON_PATH: 10,
-            Colors.DUNGEON_ENTRANCE: 10
-        }
-
         for neighbor_x, neighbor_y in neighbor_coordinates_list:
             pixel_color = image.getpixel((neighbor_x, neighbor_y))
-            weight = color_weights.get(pixel_color)
+            weight = COLOR_WEIGHTS.get(pixel_color)
             if weight is None:
                 raise ValueError(f"Unknown color found: {pixel_color}")
             self.add_undirected_edge(coordinates, (neighbor_x, neighbor_y), weight)
@@ -185,42 +343,289 @@ class Graph:
                     neighbors.append((nx, ny))
         return neighbors
 
+    def set_terrain(self, changes: Dict[Tuple[int, int], Tuple[int, int, int]]) -> Set[Tuple[int, int]]:
+        """Change the color of some pixels and update their edges in place.
+
+        The edges end up as build_graph would have built them from the changed
+        image: an edge weighs the COLOR_WEIGHTS entry of its upper/left
+        endpoint, and DUNGEON_WALL pixels have no node at all.
+
+        Parameters:
+        - changes: New color of each changed pixel (x, y).
+
+        Returns:
+        - The pixels whose edges may have changed (the changed pixels and their
+          neighbors), to be passed on to incremental searches.
+
+        Raises:
+        - ValueError: If a color is undefined or a pixel is off the map.
+        """
+        width, height = self.image.size
+        for pixel, color in changes.items():
+            if color != Colors.DUNGEON_WALL and color not in COLOR_WEIGHTS:
+                raise ValueError(f"Unknown color found: {color}")
+            if not (0 <= pixel[0] < width and 0 <= pixel[1] < height):
+                raise ValueError(f"Pixel {pixel} is outside the {width}x{height} map")
+        if self.image.mode != 'RGB':
+            self.image = self.image.convert('RGB')
+        for pixel, color in changes.items():
+            self.image.putpixel(pixel, color)
+
+        for pixel in changes:
+            for neighbor in self.adj.pop(pixel, {}):
+                del self.adj[neighbor][pixel]
+                self.num_edges -= 2
+        for pixel, color in changes.items():
+            if color == Colors.DUNGEON_WALL:
+                continue
+            self.add_node(pixel)
+            for neighbor in self.get_neighbors(pixel, width, height, self.image):
+                if neighbor in self.adj[pixel]:
+                    continue
+                weight = COLOR_WEIGHTS[self.image.getpixel(min(pixel, neighbor))]
+                self.adj.setdefault(neighbor, {})
+                self.adj[pixel][neighbor] = weight
+                self.adj[neighbor][pixel] = weight
+                self.num_edges += 2
+        self.num_nodes = len(self.adj)
+        self._bump_version()
+        return touched_pixels(changes, width, height)
+
+    def min_edge_weight(self) -> float:
+        """Return the smallest edge weight of the graph (0 if it has no edges).
+
+        The O(E) scan runs once per version of the graph.
+        """
+        version, weight = self._min_weight
+        if version != self.version:
+            weight = min((w for neighbors in self.adj.values() for w in neighbors.values()), default=0)
+            self._min_weight = (self.version, weight)
+        return weight
+
+    def dijkstra(self, sources: List[Tuple[int, int]]) -> Dict[Tuple[int, int], float]:
+        """Compute the cost from the closest of the source pixels to every reachable node.
+
+        Parameters:
+        - sources: Pixels the sweep starts from, all at cost 0.
+
+        Returns:
+        - Dict mapping each reachable node to its shortest-path cost.
+        """
+        distances = {}
+        open_set = [(0, source) for source in set(sources)]
+        heapq.heapify(open_set)
+        while open_set:
+            cost, current = heapq.heappop(open_set)
+            if current in distances:
+                continue
+            distances[current] = cost
+            for neighbor, weight in self.adj[current].items():
+                if neighbor not in distances:
+                    heapq.heappush(open_set, (cost + weight, neighbor))
+        return distances
+
+    def shortest_paths(self,
+        source_pixel: Tuple[int, int],
+        destination_pixels: List[Tuple[int, int]],
+        stats: Optional[SearchStats] = None
+    ) -> Tuple[Dict[Tuple[int, int], float], Dict[Tuple[int, int], Tuple[int, int]]]:
+        """Find the shortest paths from a source pixel to every destination pixel in one Dijkstra sweep.
+
+        The sweep stops as soon as the last reachable destination is settled, so
+        it explores no more than a single search for the farthest destination.
+
+        Parameters:
+        - source_pixel: The source pixel (x, y) for the search.
+        - destination_pixels: List of destination pixels (x, y).
+        - stats: Optional SearchStats receiving the search counters and timing,
+          and whose on_expand hook sees every expanded node.
+
+        Returns:
+        - A tuple containing:
+        - costs: shortest-path cost of each reachable destination pixel
+        - came_from: predecessor tree; reconstruct_path(came_from, pixel) gives
+          the path to any destination in costs
+        """
+        remaining = set(destination_pixels)
+        costs = {}
+        came_from = {}
+        g_score = {source_pixel: 0}
+        closed = set()
+        open_set = [(0, source_pixel)]
+        pushed = 1
+        start = time.perf_counter() if stats is not None else 0.0
+        on_expand = stats.on_expand if stats is not None else None
+        peak_open = 1
+
+        while open_set and remaining:
+            current_g, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            closed.add(current)
+            if current in remaining:
+                remaining.discard(current)
+                costs[current] = current_g
+            for neighbor, weight in self.adj[current].items():
+                if neighbor in closed:
+                    continue
+                tentative_g_score = current_g + weight
+                if tentative_g_score < g_score.get(neighbor, float('inf')):
+                    g_score[neighbor] = tentative_g_score
+                    heapq.heappush(open_set, (tentative_g_score, neighbor))
+                    pushed += 1
+                    came_from[neighbor] = current
+            if stats is not None:
+                peak_open = max(peak_open, len(open_set))
+                if on_expand is not None:
+                    on_expand(self, current, current_g)
+        if stats is not None:
+            record_search(stats, start, len(closed), pushed, len(open_set), peak_open)
+        return costs, came_from
+
     def a_star(self,
         source_pixel: Tuple[int, int],
-        destination_pixels: List[Tuple[int, int]]
+        destination_pixels: List[Tuple[int, int]],
+        heuristic: Union[str, Heuristic, None] = None,
+        stats: Optional[SearchStats] = None
     ) -> List[Tuple[int, int]]:
         """Apply A* algorithm to find the shortest path from a source pixel to any of the destination pixels in the graph.
 
         Parameters:
         - source_pixel: The source pixel (x, y) for the search.
         - destination_pixels: List of destination pixels (x, y) to find the shortest path to.
+        - heuristic: A Heuristic, or the name of one in heuristics.HEURISTICS
+          ("manhattan", "weighted", "kdtree", "field", "alt"). Defaults to the plain
+          Manhattan distance.
+        - stats: Optional SearchStats receiving the search counters and timing,
+          and whose on_expand hook sees every expanded node.
 
         Returns:
         - List of coordinates representing the shortest path from the source pixel to any of the destination pixels.
         """
+        goals = set(destination_pixels)
         open_set = [(0, source_pixel)]
         came_from = {}
-        g_score = {node: float('inf') for node in self.adj}
-        g_score[source_pixel] = 0
-
-        def heuristic(u):
-            ux, uy = u
-            return min(abs(ux - dx) + abs(uy - dy) for dx, dy in destination_pixels)
+        # Search state only covers the explored region: nodes missing from
+        # g_score have not been reached yet (g = infinity).
+        g_score = {source_pixel: 0}
+        closed = set()
+        estimate = get_heuristic(heuristic).bind(self, destination_pixels)
+        pushed = 1
+        start = time.perf_counter() if stats is not None else 0.0
+        on_expand = stats.on_expand if stats is not None else None
+        peak_open = 1
 
         while open_set:
             _, current = heapq.heappop(open_set)
-            if current in destination_pixels:
-                path = [current]
-                while current in came_from:
-                    current = came_from[current]
-                    path.append(current)
-                path.reverse()
-                return path
-            for neighbor in self.adj[current]:
-                tentative_g_score = g_score[current] + self.adj[current][neighbor]
-                if tentative_g_score < g_score[neighbor]:
+            if current in closed:
+                # Stale entry left behind by a later, cheaper push.
+                continue
+            if current in goals:
+                if stats is not None:
+                    record_search(stats, start, len(closed), pushed, len(open_set), peak_open, goal_pops=1)
+                return reconstruct_path(came_from, current)
+            closed.add(current)
+            current_g = g_score[current]
+            for neighbor, weight in self.adj[current].items():
+                if neighbor in closed:
+                    continue
+                tentative_g_score = current_g + weight
+                if tentative_g_score < g_score.get(neighbor, float('inf')):
                     g_score[neighbor] = tentative_g_score
-                    priority = tentative_g_score + heuristic(neighbor)
+                    priority = tentative_g_score + estimate(neighbor)
                     heapq.heappush(open_set, (priority, neighbor))
+                    pushed += 1
                     came_from[neighbor] = current
+            if stats is not None:
+                peak_open = max(peak_open, len(open_set))
+                if on_expand is not None:
+                    on_expand(self, current, current_g)
+        if stats is not None:
+            record_search(stats, start, len(closed), pushed, len(open_set), peak_open)
         return []
+
+    def bidirectional_a_star(self,
+        source_pixel: Tuple[int, int],
+        destination_pixels: List[Tuple[int, int]],
+        heuristic: Union[str, Heuristic, None] = None,
+        stats: Optional[SearchStats] = None
+    ) -> List[Tuple[int, int]]:
+        """Bidirectional A*: a forward search from the source and a backward one from the destinations.
+
+        Both searches use the average potential p(u) = (h_goals(u) - h_source(u)) / 2
+        (and -p(u) backwards), which keeps them consistent with each other. They
+        stop as soon as the smallest keys of both open sets add up to the best
+        source-to-destination cost found so far, so the path is optimal. With
+        heuristic=None this is plain Manhattan, as in a_star. Takes the same
+        parameters and returns the same result as a_star.
+
+        Raises:
+        - ValueError: If the graph has one-way edges.
+        """
+        if not self.is_symmetric():
+            raise ValueError("Bidirectional search needs every edge to weigh the same both ways")
+        goals = set(destination_pixels)
+        if source_pixel in goals:
+            if stats is not None:
+                stats.record(expanded=0, pushed=1)
+            return [source_pixel]
+
+        estimate = get_heuristic(heuristic)
+        to_goals = estimate.bind(self, list(goals))
+        to_source = estimate.bind(self, [source_pixel])
+
+        def potential(u):
+            return (to_goals(u) - to_source(u)) / 2
+
+        # Index 0 is the forward search, index 1 the backward one; their keys
+        # are g + potential and g - potential.
+        signs = (1, -1)
+        g_scores = ({source_pixel: 0}, {goal: 0 for goal in goals})
+        came_from = ({}, {})
+        closed = (set(), set())
+        open_sets = ([(potential(source_pixel), source_pixel)], [(-potential(goal), goal) for goal in goals])
+        heapq.heapify(open_sets[1])
+        pushed = 1 + len(goals)
+        best_cost = float('inf')
+        meeting = None
+        start = time.perf_counter() if stats is not None else 0.0
+        on_expand = stats.on_expand if stats is not None else None
+        peak_open = pushed
+
+        while open_sets[0] and open_sets[1]:
+            if open_sets[0][0][0] + open_sets[1][0][0] >= best_cost:
+                break
+            side = 0 if len(open_sets[0]) <= len(open_sets[1]) else 1
+            _, current = heapq.heappop(open_sets[side])
+            if current in closed[side]:
+                continue
+            closed[side].add(current)
+            g_score, other_g_score = g_scores[side], g_scores[1 - side]
+            current_g = g_score[current]
+            for neighbor, weight in self.adj[current].items():
+                if neighbor in closed[side]:
+                    continue
+                tentative_g_score = current_g + weight
+                if tentative_g_score < g_score.get(neighbor, float('inf')):
+                    g_score[neighbor] = tentative_g_score
+                    priority = tentative_g_score + signs[side] * potential(neighbor)
+                    heapq.heappush(open_sets[side], (priority, neighbor))
+                    pushed += 1
+                    came_from[side][neighbor] = current
+                    if neighbor in other_g_score and tentative_g_score + other_g_score[neighbor] < best_cost:
+                        best_cost = tentative_g_score + other_g_score[neighbor]
+                        meeting = neighbor
+            if stats is not None:
+                peak_open = max(peak_open, len(open_sets[0]) + len(open_sets[1]))
+                if on_expand is not None:
+                    # g is the cost from the source forwards and to the destinations backwards.
+                    on_expand(self, current, current_g)
+
+        if stats is not None:
+            record_search(
+                stats, start, len(closed[0]) + len(closed[1]), pushed,
+                len(open_sets[0]) + len(open_sets[1]), peak_open)
+        if meeting is None:
+            return []
+        # The backward predecessors lead from the meeting node to a destination.
+        return reconstruct_path(came_from[0], meeting) + reconstruct_path(came_from[1], meeting)[::-1][1:]
@@ -0,0 +1,690 @@
+from collections.abc import Mapping
+import hashlib
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from build_map import chars_to_colors, read_map_chars
+from colors import Colors
+from distance_fields import DistanceFields
+from graph import COLOR_WEIGHTS, DESTINATION_COLORS, SOURCE_COLORS, Graph, pack_colors, reconstruct_path, touched_pixels
+from heuristics import Heuristic
+from hierarchy import Hierarchy
+from landmarks import Landmarks
+from load_image import load_image
+from rectangles import Rectangles
+from search_stats import SearchStats
+
+
+def _pack_color(color: Tuple[int, int, int]) -> int:
+    r, g, b = color
+    return (r << 16) | (g << 8) | b
+
+
+# Weight of every known color, packed as 0xRRGGBB (walls weigh 0).
+_PACKED_WEIGHTS = {_pack_color(color): weight for color, weight in COLOR_WEIGHTS.items()}
+_PACKED_WEIGHTS[_pack_color(Colors.DUNGEON_WALL)] = 0
+
+# Sorted packed colors and their weights, for vectorized lookups. The position of
+# a color in _KNOWN_COLORS is its terrain code.
+_KNOWN_COLORS = np.array(sorted(_PACKED_WEIGHTS), dtype=np.uint32)
+_KNOWN_WEIGHTS = np.array([_PACKED_WEIGHTS[int(c)] for c in _KNOWN_COLORS], dtype=np.uint16)
+TERRAIN_PALETTE = [(int(c) >> 16, (int(c) >> 8) & 0xFF, int(c) & 0xFF) for c in _KNOWN_COLORS]
+SOURCE_CODES = np.searchsorted(_KNOWN_COLORS, [_pack_color(c) for c in SOURCE_COLORS])
+DESTINATION_CODES = np.searchsorted(_KNOWN_COLORS, [_pack_color(c) for c in DESTINATION_COLORS])
+
+
+def classify_colors(colors: np.ndarray) -> np.ndarray:
+    """Map an (..., 3) RGB array to uint8 terrain codes (indices into TERRAIN_PALETTE).
+
+    Raises:
+        ValueError: If the array holds an undefined color. For 2D maps the first
+            unknown color in column-major (x, then y) order is reported.
+    """
+    packed = pack_colors(colors)
+    codes = np.minimum(np.searchsorted(_KNOWN_COLORS, packed), len(_KNOWN_COLORS) - 1)
+    unknown = _KNOWN_COLORS[codes] != packed
+    if unknown.any():
+        position = tuple(np.argwhere(unknown.T)[0][::-1])
+        pixel_color = tuple(int(c) for c in colors[position])
+        raise ValueError(f"Unknown color found: {pixel_color}")
+    return codes.astype(np.uint8)
+
+
+def terrain_costs(terrain: np.ndarray) -> np.ndarray:
+    """Map terrain codes to uint16 cell costs (0 for walls)."""
+    return _KNOWN_WEIGHTS[terrain]
+
+
+class GridAdjacency(Mapping):
+    """Read-only adjacency view over a GridGraph.
+
+    Behaves like the dict-of-dicts used by Graph (``adj[u][v]`` gives the weight
+    of the edge u -> v), but the neighbor dicts are computed on the fly from the
+    cost grid instead of being stored.
+    """
+
+    def __init__(self, graph: "GridGraph") -> None:
+        self.graph = graph
+
+    def __getitem__(self, node: Tuple[int, int]) -> Dict[Tuple[int, int], int]:
+        if node not in self:
+            raise KeyError(node)
+        return self.graph.neighbors(node)
+
+    def __contains__(self, node: Any) -> bool:
+        try:
+            x, y = node
+        except (TypeError, ValueError):
+            return False
+        graph = self.graph
+        return 0 <= x < graph.width and 0 <= y < graph.height and graph.cost[y * graph.width + x] != 0
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        graph = self.graph
+        grid = graph.cost.reshape(graph.height, graph.width)
+        # Column-major order, the same order in which build_graph visits pixels,
+        # a block of columns at a time so no full-size temporary is made.
+        columns = max(1, (1 << 20) // max(graph.height, 1))
+        for left in range(0, graph.width, columns):
+            for index in np.flatnonzero(grid[:, left:left + columns].T).tolist():
+                x, y = divmod(index, graph.height)
+                yield (left + x, y)
+
+    def __len__(self) -> int:
+        return self.graph.num_nodes
+
+
+class GridGraph(Graph):
+    """Compact graph over a 4-connected pixel grid.
+
+    Instead of a dict of neighbor dicts per pixel, the graph keeps a flat cost
+    grid indexed by ``y * width + x`` (0 marks a wall) and computes neighbors on
+    demand. The ``adj`` attribute is a GridAdjacency view, so code written
+    against Graph (``a_star``, ``ZeldaJourney._path_cost``) works unchanged.
+
+    Alongside the costs, a uint8 terrain grid records the color code of every
+    pixel (see TERRAIN_PALETTE), so the graph does not need the source image.
+
+    The weight of an edge is the cost of its upper/left endpoint, which is the
+    value Graph.build_graph ends up storing after both endpoints have written
+    their undirected edges.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.width = 0
+        self.height = 0
+        self.cost = np.zeros(0, dtype=np.uint16)
+        self.terrain = np.zeros(0, dtype=np.uint8)
+        self._min_edge_weight = 0
+        # Version the counts were taken at; they are taken on first use, so
+        # memory-mapping a grid reads none of it.
+        self._counted_version = None
+        self.landmarks = None
+        self.rectangles = None
+        self.hierarchy = None
+        self.distance_fields = None
+        self.adj = GridAdjacency(self)
+
+    @classmethod
+    def from_arrays(cls, width: int, height: int, terrain: np.ndarray, cost: np.ndarray) -> "GridGraph":
+        """Create a GridGraph over existing flat terrain and cost grids (not copied).
+
+        Parameters:
+            width: Map width
+            height: Map height
+            terrain: uint8 terrain codes, indexed by y * width + x
+            cost: Cell costs (0 for walls), indexed by y * width + x
+        """
+        graph = cls()
+        graph.width, graph.height = width, height
+        graph.terrain = terrain
+        graph.cost = cost
+        graph._bump_version()
+        return graph
+
+    def add_node(self, node: Any) -> None:
+        """Not supported: use set_terrain to change the grid.
+
+        Raises:
+            TypeError: Always
+        """
+        raise TypeError("GridGraph is defined by its cost grid; use set_terrain to change it")
+
+    def add_directed_edge(self, u, v, weight):
+        """Not supported: use set_terrain to change the grid.
+
+        Raises:
+            TypeError: Always
+        """
+        raise TypeError("GridGraph is defined by its cost grid; use set_terrain to change it")
+
+    def index(self, pixel: Tuple[int, int]) -> int:
+        """Return the flat index of a pixel (x, y) in the cost grid."""
+        x, y = pixel
+        return y * self.width + x
+
+    def pixel(self, index: int) -> Tuple[int, int]:
+        """Return the pixel (x, y) of a flat index in the cost grid."""
+        y, x = divmod(index, self.width)
+        return (x, y)
+
+    def color_at(self, pixel: Tuple[int, int]) -> Tuple[int, int, int]:
+        """Return the map color of a pixel (x, y)."""
+        return TERRAIN_PALETTE[self.terrain[self.index(pixel)]]
+
+    def colors(self) -> np.ndarray:
+        """Return a new (height, width, 3) uint8 array with the map color of every pixel."""
+        palette = np.array(TERRAIN_PALETTE, dtype=np.uint8)
+        return palette[self.terrain].reshape(self.height, self.width, 3)
+
+    def fingerprint(self) -> str:
+        """Return a hash of the dimensions and cost grid, identifying the graph's edges."""
+        digest = hashlib.sha256(f"{self.width}x{self.height}".encode())
+        digest.update(np.ascontiguousarray(self.cost, dtype="<u2").data)
+        return digest.hexdigest()
+
+    def build_landmarks(self, count: int = 8) -> Landmarks:
+        """Run the ALT preprocessing and keep the result for the "alt" heuristic.
+
+        Parameters:
+            count: Number of landmarks
+
+        Returns:
+            The Landmarks now stored in self.landmarks
+        """
+        self.landmarks = Landmarks.build(self, count)
+        return self.landmarks
+
+    def build_rectangles(self) -> Rectangles:
+        """Run the rectangular symmetry reduction and keep the result for rsr_a_star.
+
+        Returns:
+            The Rectangles now stored in self.rectangles
+        """
+        self.rectangles = Rectangles.build(self)
+        return self.rectangles
+
+    def rsr_a_star(self,
+        source_pixel: Tuple[int, int],
+        destination_pixels: List[Tuple[int, int]],
+        heuristic: Union[str, Heuristic, None] = None,
+        stats: Optional[SearchStats] = None
+    ) -> List[Tuple[int, int]]:
+        """A* that skips the interiors of uniform-cost rectangles (see Rectangles).
+
+        Takes the same parameters as a_star and returns a path of the same cost,
+        while expanding far fewer nodes on maps with large open regions. On maps
+        of small or noisy regions plain a_star is faster (see Rectangles). The
+        rectangles are built on first use and rebuilt when the cost grid changes.
+        """
+        if self.rectangles is None or self.rectangles.version != self.version:
+            self.build_rectangles()
+        return self.rectangles.a_star(source_pixel, destination_pixels, heuristic, stats)
+
+    def build_hierarchy(self, cluster_size: int = 16, exact: bool = False) -> Hierarchy:
+        """Run the HPA* preprocessing and keep the result for hpa_a_star.
+
+        Parameters:
+            cluster_size: Width and height of a cluster, in cells
+            exact: Make every border crossing an entrance, so paths stay optimal
+
+        Returns:
+            The Hierarchy now stored in self.hierarchy
+        """
+        self.hierarchy = Hierarchy.build(self, cluster_size, exact)
+        return self.hierarchy
+
+    def hpa_a_star(self,
+        source_pixel: Tuple[int, int],
+        destination_pixels: List[Tuple[int, int]],
+        heuristic: Union[str, Heuristic, None] = None,
+        stats: Optional[SearchStats] = None
+    ) -> List[Tuple[int, int]]:
+        """Hierarchical search through the clusters of self.hierarchy (see Hierarchy).
+
+        Takes the same parameters as a_star. The hierarchy is built with the
+        default settings on first use, and rebuilt when the cost grid changed
+        without a Hierarchy.update() call.
+        """
+        if self.hierarchy is None:
+            self.build_hierarchy()
+        elif self.hierarchy.version != self.version:
+            self.build_hierarchy(self.hierarchy.cluster_size, self.hierarchy.exact)
+        return self.hierarchy.a_star(source_pixel, destination_pixels, heuristic, stats)
+
+    def build_distance_fields(self, targets: List[Tuple[int, int]]) -> DistanceFields:
+        """Precompute the cost and next step from every cell to each target pixel.
+
+        Parameters:
+            targets: Pixels queries will lead to, such as the source and
+                destinations returned by build_graph
+
+        Returns:
+            The DistanceFields now stored in self.distance_fields
+        """
+        self.distance_fields = DistanceFields.build(self, targets)
+        return self.distance_fields
+
+    def _fields_covering(self, targets: List[Tuple[int, int]]) -> Optional[DistanceFields]:
+        """Return self.distance_fields if it is up to date and has a field for every target."""
+        fields = self.distance_fields
+        if fields is None or fields.version != self.version:
+            return None
+        if not all(target in fields.targets for target in targets):
+            return None
+        return fields
+
+    def field_path(self,
+        source_pixel: Tuple[int, int],
+        destination_pixels: List[Tuple[int, int]],
+        heuristic: Union[str, Heuristic, None] = None,
+        stats: Optional[SearchStats] = None
+    ) -> List[Tuple[int, int]]:
+        """Shortest path to the closest destination, walked on the distance fields.
+
+        Takes the same parameters and returns the same result as a_star. Without
+        an up-to-date field for every destination it runs a_star instead.
+        """
+        fields = self._fields_covering(destination_pixels)
+        if fields is None or not destination_pixels:
+            return self.a_star(source_pixel, destination_pixels, heuristic, stats)
+        start = time.perf_counter()
+        target = min(destination_pixels, key=lambda pixel: fields.cost(source_pixel, pixel))
+        path = fields.path(source_pixel, target)
+        if stats is not None:
+            stats.record(expanded=0, pushed=0, seconds=time.perf_counter() - start)
+        return path
+
+    def shortest_paths(self,
+        source_pixel: Tuple[int, int],
+        destination_pixels: List[Tuple[int, int]],
+        stats: Optional[SearchStats] = None
+    ) -> Tuple[Dict[Tuple[int, int], float], Dict[Tuple[int, int], Tuple[int, int]]]:
+        """Same as Graph.shortest_paths, but read from the distance fields when they cover every destination.
+
+        Every path walked from source_pixel is a shortest path, and so is each of
+        its prefixes, so the paths merge into a valid predecessor tree.
+        """
+        fields = self._fields_covering(destination_pixels)
+        if fields is None:
+            return super().shortest_paths(source_pixel, destination_pixels, stats)
+        start = time.perf_counter()
+        costs = {}
+        came_from = {}
+        for target in dict.fromkeys(destination_pixels):
+            path = fields.path(source_pixel, target)
+            if not path:
+                continue
+            costs[target] = fields.cost(source_pixel, target)
+            for previous, pixel in zip(path, path[1:]):
+                came_from.setdefault(pixel, previous)
+        if stats is not None:
+            stats.record(expanded=0, pushed=0, seconds=time.perf_counter() - start)
+        return costs, came_from
+
+    def is_symmetric(self) -> bool:
+        """Grid edges always weigh the same both ways."""
+        return True
+
+    def min_edge_weight(self) -> float:
+        """Return the smallest edge weight of the graph (0 if it has no edges)."""
+        self._refresh_counts()
+        return self._min_edge_weight
+
+    @property
+    def num_nodes(self) -> int:
+        self._refresh_counts()
+        return self._num_nodes
+
+    @num_nodes.setter
+    def num_nodes(self, value: int) -> None:
+        self._num_nodes = value
+
+    @property
+    def num_edges(self) -> int:
+        self._refresh_counts()
+        return self._num_edges
+
+    @num_edges.setter
+    def num_edges(self, value: int) -> None:
+        self._num_edges = value
+
+    def neighbors(self, node: Tuple[int, int]) -> Dict[Tuple[int, int], int]:
+        """Return the traversable neighbors of a pixel mapped to the edge weights.
+
+        Parameters:
+            node: (x, y) position of the pixel
+
+        Returns:
+            Dict mapping each neighbor (x, y) to the weight of the edge
+        """
+        x, y = node
+        width = self.width
+        cost = self.cost
+        i = y * width + x
+        neighbors = {}
+        if x > 0 and cost[i - 1]:
+            neighbors[(x - 1, y)] = int(cost[i - 1])
+        if x + 1 < width and cost[i + 1]:
+            neighbors[(x + 1, y)] = int(cost[i])
+        if y > 0 and cost[i - width]:
+            neighbors[(x, y - 1)] = int(cost[i - width])
+        if y + 1 < self.height and cost[i + width]:
+            neighbors[(x, y + 1)] = int(cost[i])
+        return neighbors
+
+    def set_terrain(self, changes: Dict[Tuple[int, int], Tuple[int, int, int]]) -> Set[Tuple[int, int]]:
+        """Change the color of some pixels, updating the terrain and cost grids in place.
+
+        Grids mapped read-only from a .grid file are copied first, so the file
+        is never written. A hierarchy is updated cluster by cluster; landmarks
+        are dropped, since their tables no longer bound the new costs.
+
+        Parameters:
+            changes: New color of each changed pixel (x, y)
+
+        Returns:
+            The pixels whose edges may have changed (the changed pixels and
+            their neighbors), to be passed on to incremental searches
+
+        Raises:
+            ValueError: If a color is undefined or a pixel is off the map
+        """
+        pixels = list(changes)
+        for x, y in pixels:
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                raise ValueError(f"Pixel {(x, y)} is outside the {self.width}x{self.height} map")
+        codes = classify_colors(np.array([changes[pixel] for pixel in pixels], dtype=np.uint8).reshape(-1, 3))
+        if not self.terrain.flags.writeable:
+            self.terrain = np.array(self.terrain)
+        if not self.cost.flags.writeable:
+            self.cost = np.array(self.cost)
+        indices = [self.index(pixel) for pixel in pixels]
+        self.terrain[indices] = codes
+        self.cost[indices] = terrain_costs(codes)
+        if self.image is not None:
+            if self.image.mode != 'RGB':
+                self.image = self.image.convert('RGB')
+            for pixel in pixels:
+                self.image.putpixel(pixel, changes[pixel])
+        self._bump_version()
+
+        self.landmarks = None
+        if self.hierarchy is not None:
+            self.hierarchy.update(pixels)
+        return touched_pixels(pixels, self.width, self.height)
+
+    def build_graph(self, image_path: str) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+        """Build the cost grid from a bitmap image.
+
+        Parameters:
+        - image_path (str): File path of the bitmap image.
+
+        Returns:
+        - A tuple containing:
+        - source_pixel: starting point
+        - destination_pixels: list of target points (dungeons and Master Sword)
+
+        Raises:
+        - ValueError: If the image has no source pixel or an undefined color.
+        """
+        self.image = load_image(image_path)
+        return self.build_from_colors(np.asarray(self.image.convert('RGB')))
+
+    def build_graph_from_txt(self, file_path: str) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+        """Build the cost grid straight from a text map, without any bitmap.
+
+        Parameters:
+        - file_path (str): File path of the text map.
+
+        Returns:
+        - The same (source_pixel, destination_pixels) tuple as build_graph.
+        """
+        self.image = None
+        return self.build_from_colors(chars_to_colors(read_map_chars(file_path)))
+
+    def build_from_colors(self, colors: np.ndarray) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+        """Build the cost grid from an RGB array with array operations.
+
+        Parameters:
+        - colors: Array of shape (height, width, 3) with the color of each pixel.
+
+        Returns:
+        - A tuple containing:
+        - source_pixel: starting point
+        - destination_pixels: list of target points (dungeons and Master Sword)
+
+        Raises:
+        - ValueError: If the map has no source pixel or an undefined color.
+        """
+        height, width = colors.shape[:2]
+        terrain = classify_colors(colors)
+
+        self.width, self.height = width, height
+        self.terrain = terrain.ravel()
+        self.cost = terrain_costs(self.terrain)
+        self._bump_version()
+
+        # Pixels are scanned column by column (x, then y), hence the transposes.
+        sources = np.flatnonzero(np.isin(terrain.T, SOURCE_CODES))
+        destinations = np.flatnonzero(np.isin(terrain.T, DESTINATION_CODES))
+        if len(sources) == 0:
+            raise ValueError("No source pixel found in the image")
+        source_pixel = divmod(int(sources[-1]), height)
+        destination_pixels = [divmod(int(index), height) for index in destinations]
+        return source_pixel, destination_pixels
+
+    def _refresh_counts(self) -> None:
+        """Count nodes and edges if the cost grid changed since the last count."""
+        if self._counted_version != self.version:
+            self._counted_version = self.version
+            self._count_cells(self.cost)
+
+    def _count_cells(self, cost: np.ndarray) -> None:
+        """Set num_nodes, num_edges (directed) and the cheapest edge weight from a cost grid.
+
+        The grid is scanned in blocks of rows, so the temporaries stay small on
+        maps larger than memory.
+        """
+        width, height = self.width, self.height
+        grid = cost.reshape(height, width)
+        rows = max(1, (1 << 20) // max(width, 1))
+        nodes = edges = 0
+        cheapest = np.iinfo(np.uint16).max
+        for top in range(0, height, rows):
+            # One extra row, for the vertical edges into the next block.
+            block = grid[top:top + rows + 1]
+            passable = block != 0
+            own = passable[:rows]
+            nodes += int(np.count_nonzero(own))
+            edges += int(np.count_nonzero(own[:, :-1] & own[:, 1:]))
+            edges += int(np.count_nonzero(passable[:-1] & passable[1:]))
+            cheapest = min(cheapest, int(np.min(block[:rows], where=own, initial=cheapest)))
+        self.num_nodes = nodes
+        self.num_edges = 2 * edges
+        # Every edge weighs the cost of one of its endpoints, so the cheapest
+        # cell bounds the cheapest edge from below.
+        self._min_edge_weight = cheapest if edges else 0
+
+    def with_costs(self, weights: Optional[Dict[Tuple[int, int, int], int]] = None) -> "ProfileGraph":
+        """Return a view of this map weighed by another cost table (see ProfileGraph).
+
+        Parameters:
+            weights: New weight of some colors, e.g. {Colors.WATER: 20} for a
+                unit that swims; see cost_table
+
+        Returns:
+            A ProfileGraph sharing this graph's terrain grid
+        """
+        return ProfileGraph(self, cost_table(weights))
+
+
+def cost_table(weights: Optional[Dict[Tuple[int, int, int], int]] = None) -> np.ndarray:
+    """Return the uint16 cost of every terrain code (see TERRAIN_PALETTE) under a color weight table.
+
+    Colors missing from weights keep their COLOR_WEIGHTS weight (DUNGEON_WALL
+    stays a wall), and a weight of 0 makes a terrain impassable.
+
+    Raises:
+        ValueError: If a color is undefined or a weight does not fit in a uint16
+    """
+    table = dict(zip(TERRAIN_PALETTE, _KNOWN_WEIGHTS.tolist()))
+    for color, weight in (weights or {}).items():
+        if color not in table:
+            raise ValueError(f"Unknown color found: {color}")
+        if not 0 <= weight <= np.iinfo(np.uint16).max:
+            raise ValueError(f"Weight {weight} of {color} does not fit in a uint16")
+        table[color] = weight
+    return np.array([table[color] for color in TERRAIN_PALETTE], dtype=np.uint16)
+
+
+class ProfileAdjacency(GridAdjacency):
+    """GridAdjacency of a ProfileGraph, which tells walls apart through its cost table."""
+
+    def __contains__(self, node: Any) -> bool:
+        try:
+            x, y = node
+        except (TypeError, ValueError):
+            return False
+        graph = self.graph
+        width = graph.width
+        return 0 <= x < width and 0 <= y < graph.height and graph._weights[graph._codes()[y * width + x]] != 0
+
+
+class ProfileGraph(GridGraph):
+    """A GridGraph weighing the terrain grid of another GridGraph with its own cost table.
+
+    Nothing is copied: the terrain grid stays the base graph's, and searches
+    look the cost of each cell they reach up in the table. One loaded map can
+    thus serve several cost profiles at once (one per unit type, say), each for
+    the price of its table. Whole-grid work (landmarks, rectangles, hierarchy,
+    distance fields, fingerprint) reads `cost`, which is built from the table
+    on first use and kept until the terrain changes.
+
+    Every profile sees the terrain changes of the base graph, since they share
+    it, whichever graph they are made through. The version of a profile
+    follows the base's, so its caches and preprocessing are dropped or
+    rebuilt, and its counts are refreshed on next use. Landmarks built before
+    a change read as None, even when the change went straight to the base.
+
+    Parameters:
+        base: The GridGraph whose terrain is weighed
+        table: Cost of each terrain code, as returned by cost_table
+    """
+
+    def __init__(self, base: GridGraph, table: np.ndarray) -> None:
+        self.base = base
+        self.table = table
+        # Plain ints, for the lookups of every search step.
+        self._weights = table.tolist()
+        self._terrain_view = (None, None)
+        self._cost_grid = (None, None)
+        # Base version the counts were taken at.
+        self._counted_version = None
+        # The grids are the base's, so only Graph's own state is set up here.
+        Graph.__init__(self)
+        self._min_edge_weight = 0
+        self.landmarks = None
+        self.rectangles = None
+        self.hierarchy = None
+        self.distance_fields = None
+        self.adj = ProfileAdjacency(self)
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        """Version of the base graph's terrain and of this profile."""
+        return (self.base.version, self._version)
+
+    @version.setter
+    def version(self, value: int) -> None:
+        self._version = value
+
+    @property
+    def landmarks(self) -> Optional[Landmarks]:
+        """Landmarks of the profile, or None once the terrain changed since they were built."""
+        if self._landmarks is not None and self._landmarks.version != self.version:
+            self._landmarks = None
+        return self._landmarks
+
+    @landmarks.setter
+    def landmarks(self, value: Optional[Landmarks]) -> None:
+        self._landmarks = value
+
+    def _refresh_counts(self) -> None:
+        """Recount nodes and edges if the shared terrain changed since the last count."""
+        if self._counted_version != self.base.version:
+            self._counted_version = self.base.version
+            # Count on a temporary grid rather than keeping one.
+            self._count_cells(self.table[self.terrain])
+
+    @property
+    def width(self) -> int:
+        return self.base.width
+
+    @property
+    def height(self) -> int:
+        return self.base.height
+
+    @property
+    def terrain(self) -> np.ndarray:
+        return self.base.terrain
+
+    @property
+    def cost(self) -> np.ndarray:
+        """Read-only cost grid of the profile, built on first use and after terrain changes."""
+        version, cost = self._cost_grid
+        if version != self.version:
+            cost = self.table[self.terrain]
+            cost.flags.writeable = False
+            self._cost_grid = (self.version, cost)
+        return cost
+
+    def _codes(self) -> memoryview:
+        """Return the terrain grid as a memoryview, whose items are plain ints."""
+        terrain, view = self._terrain_view
+        if terrain is not self.base.terrain:
+            terrain = self.base.terrain
+            view = memoryview(np.ascontiguousarray(terrain, dtype=np.uint8))
+            self._terrain_view = (terrain, view)
+        return view
+
+    def neighbors(self, node: Tuple[int, int]) -> Dict[Tuple[int, int], int]:
+        """Same as GridGraph.neighbors, with the costs looked up in the table."""
+        x, y = node
+        width = self.width
+        codes = self._codes()
+        weights = self._weights
+        i = y * width + x
+        own = weights[codes[i]]
+        neighbors = {}
+        if x > 0:
+            weight = weights[codes[i - 1]]
+            if weight:
+                neighbors[(x - 1, y)] = weight
+        if x + 1 < width and weights[codes[i + 1]]:
+            neighbors[(x + 1, y)] = own
+        if y > 0:
+            weight = weights[codes[i - width]]
+            if weight:
+                neighbors[(x, y - 1)] = weight
+        if y + 1 < self.height and weights[codes[i + width]]:
+            neighbors[(x, y + 1)] = own
+        return neighbors
+
+    def set_terrain(self, changes: Dict[Tuple[int, int], Tuple[int, int, int]]) -> Set[Tuple[int, int]]:
+        """Change the terrain of the base graph, shared by all its profiles (see GridGraph.set_terrain)."""
+        touched = self.base.set_terrain(changes)
+        if self.hierarchy is not None:
+            self.hierarchy.update(list(changes))
+        return touched
+
+    def build_from_colors(self, colors: np.ndarray) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+        """Profiles are views and cannot be built; build the base graph instead.
+
+        Raises:
+            TypeError: Always (build_graph and build_graph_from_txt end here too)
+        """
+        raise TypeError("A ProfileGraph only weighs the terrain of its base graph; build the base graph instead")
@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from build_map import chars_to_colors, lines_to_chars
+from grid_graph import DESTINATION_CODES, SOURCE_CODES, GridGraph, classify_colors, terrain_costs
+
+
+# File layout: MAGIC, two little-endian uint64 with the offset and length of the
+# JSON header, then the uint8 terrain grid and the uint16 cost grid, each on an
+# ALIGNMENT boundary so they can be memory-mapped in place, and finally the JSON
+# header. Keeping the header last lets converters stream the grids out before
+# the source and destinations are known.
+MAGIC = b"ZGRID02\n"
+PREFIX = struct.Struct("<QQ")
+ALIGNMENT = 64
+
+# Map rows converted per chunk by convert_map_to_grid.
+ROWS_PER_CHUNK = 1024
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _grid_offsets(size: int) -> Tuple[int, int, int]:
+    """Return the terrain, cost and header offsets of a grid with size cells."""
+    terrain_offset = _align(len(MAGIC) + PREFIX.size)
+    cost_offset = _align(terrain_offset + size)
+    return terrain_offset, cost_offset, cost_offset + 2 * size
+
+
+def _create_grid_file(file_path: str, width: int, height: int) -> Tuple[np.memmap, np.memmap]:
+    """Create a grid file without header and return writable maps of its grids."""
+    size = width * height
+    terrain_offset, cost_offset, header_offset = _grid_offsets(size)
+    with open(file_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(PREFIX.pack(0, 0))
+        file.truncate(header_offset)
+    terrain = np.memmap(file_path, dtype=np.uint8, mode="r+", offset=terrain_offset, shape=(size,))
+    cost = np.memmap(file_path, dtype="<u2", mode="r+", offset=cost_offset, shape=(size,))
+    return terrain, cost
+
+
+def _finish_grid_file(
+    file_path: str,
+    width: int,
+    height: int,
+    source: Tuple[int, int],
+    destinations: List[Tuple[int, int]],
+    key: Optional[str]
+) -> None:
+    """Append the JSON header to a grid file created by _create_grid_file."""
+    terrain_offset, cost_offset, header_offset = _grid_offsets(width * height)
+    header = json.dumps({
+        "width": width,
+        "height": height,
+        "source": list(source),
+        "destinations": [list(pixel) for pixel in destinations],
+        "key": key,
+        "terrain_offset": terrain_offset,
+        "cost_offset": cost_offset,
+    }).encode()
+    with open(file_path, "r+b") as file:
+        file.seek(header_offset)
+        file.write(header)
+        file.seek(len(MAGIC))
+        file.write(PREFIX.pack(header_offset, len(header)))
+
+
+def save_grid(
+    file_path: str,
+    graph: GridGraph,
+    source: Tuple[int, int],
+    destinations: List[Tuple[int, int]],
+    key: Optional[str] = None
+) -> None:
+    """Write a built GridGraph, its source and its destinations to a binary grid file.
+
+    The file is written to a temporary name first and then renamed, so readers
+    never see a partially written grid.
+
+    Parameters:
+    - file_path: Path of the grid file.
+    - graph: The built GridGraph.
+    - source: Starting pixel returned by build_graph.
+    - destinations: Target pixels returned by build_graph.
+    - key: Optional cache key stored in the header.
+    """
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    terrain, cost = _create_grid_file(temp_path, graph.width, graph.height)
+    terrain[:] = graph.terrain
+    cost[:] = graph.cost
+    terrain.flush()
+    cost.flush()
+    del terrain, cost
+    _finish_grid_file(temp_path, graph.width, graph.height, source, destinations, key)
+    os.replace(temp_path, file_path)
+
+
+def read_grid_header(file_path: str) -> Dict[str, Any]:
+    """Read the JSON header of a binary grid file.
+
+    Raises:
+    - ValueError: If the file is not a complete grid file.
+    """
+    with open(file_path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a grid file: {file_path}")
+        header_offset, header_length = PREFIX.unpack(file.read(PREFIX.size))
+        if header_length == 0:
+            raise ValueError(f"Incomplete grid file: {file_path}")
+        file.seek(header_offset)
+        return json.loads(file.read(header_length))
+
+
+def load_grid(file_path: str) -> Tuple[GridGraph, Tuple[int, int], List[Tuple[int, int]]]:
+    """Load a binary grid file, memory-mapping its terrain and cost grids.
+
+    Nothing but the header is read up front: cells are paged in by the
+    operating system as searches touch them, so maps larger than the available
+    memory can be searched.
+
+    Parameters:
+    - file_path: Path of the grid file.
+
+    Returns:
+    - A tuple (graph, source_pixel, destination_pixels).
+    """
+    header = read_grid_header(file_path)
+    size = header["width"] * header["height"]
+    terrain = np.memmap(file_path, dtype=np.uint8, mode="r", offset=header["terrain_offset"], shape=(size,))
+    cost = np.memmap(file_path, dtype="<u2", mode="r", offset=header["cost_offset"], shape=(size,))
+    graph = GridGraph.from_arrays(header["width"], header["height"], terrain, cost)
+    source = tuple(header["source"])
+    destinations = [tuple(pixel) for pixel in header["destinations"]]
+    return graph, source, destinations
+
+
+def _bmp_rows(file_path: str, rows_per_chunk: int) -> Tuple[int, int, Iterator[np.ndarray]]:
+    """Memory-map the pixels of an uncompressed 24 or 32-bit BMP.
+
+    Returns:
+    - (width, height, chunks), where chunks yields (rows, width, 3) RGB arrays
+      from the top of the image down.
+
+    Raises:
+    - ValueError: If the file is not a BMP this reader supports.
+    """
+    with open(file_path, "rb") as file:
+        file_header = file.read(54)
+    if len(file_header) < 54 or file_header[:2] != b"BM":
+        raise ValueError(f"Not a BMP file: {file_path}")
+    (pixel_offset,) = struct.unpack_from("<I", file_header, 10)
+    width, height, _, bits, compression = struct.unpack_from("<iiHHI", file_header, 18)
+    if bits not in (24, 32) or compression not in (0, 3):
+        raise ValueError(f"Unsupported BMP ({bits} bits, compression {compression}): {file_path}")
+
+    top_down = height < 0
+    height = abs(height)
+    stride = (bits * width + 31) // 32 * 4
+    pixels = np.memmap(file_path, dtype=np.uint8, mode="r", offset=pixel_offset, shape=(height, stride))
+    channels = bits // 8
+
+    def chunks() -> Iterator[np.ndarray]:
+        for y0 in range(0, height, rows_per_chunk):
+            y1 = min(y0 + rows_per_chunk, height)
+            rows = pixels[y0:y1] if top_down else pixels[height - y1:height - y0][::-1]
+            bgr = rows[:, :width * channels].reshape(y1 - y0, width, channels)
+            yield bgr[:, :, 2::-1]
+
+    return width, height, chunks()
+
+
+def _txt_rows(file_path: str, rows_per_chunk: int) -> Tuple[int, int, Iterator[np.ndarray]]:
+    """Stream the rows of a text map as RGB arrays.
+
+    Returns:
+    - (width, height, chunks), where chunks yields (rows, width, 3) RGB arrays.
+    """
+    with open(file_path, "r") as file:
+        first = file.readline().strip()
+        height = 1 + sum(1 for _ in file)
+    width = len(first)
+
+    def chunks() -> Iterator[np.ndarray]:
+        with open(file_path, "r") as file:
+            lines = []
+            for line in file:
+                lines.append(line.strip())
+                if len(lines) == rows_per_chunk:
+                    yield chars_to_colors(lines_to_chars(lines, width))
+                    lines = []
+            if lines:
+                yield chars_to_colors(lines_to_chars(lines, width))
+
+    return width, height, chunks()
+
+
+def convert_map_to_grid(
+    map_path: str,
+    grid_path: str,
+    rows_per_chunk: int = ROWS_PER_CHUNK
+) -> Tuple[Tuple[int, int], List[Tuple[int, int]]]:
+    """Convert a BMP or TXT map into a binary grid file, a chunk of rows at a time.
+
+    The BMP pixels are memory-mapped rather than decoded through PIL, so only
+    rows_per_chunk rows of the map are held in memory at once.
+
+    Parameters:
+    - map_path: Path of the uncompressed BMP or TXT map.
+    - grid_path: Path of the grid file to write.
+    - rows_per_chunk: Number of map rows converted at once.
+
+    Returns:
+    - The (source_pixel, destination_pixels) tuple of the map, as build_graph returns it.
+
+    Raises:
+    - ValueError: If the map has no source pixel or an undefined color.
+    """
+    if map_path.lower().endswith(".txt"):
+        width, height, chunks = _txt_rows(map_path, rows_per_chunk)
+    else:
+        width, height, chunks = _bmp_rows(map_path, rows_per_chunk)
+
+    temp_path = f"{grid_path}.{os.getpid()}.tmp"
+    terrain, cost = _create_grid_file(temp_path, width, height)
+    sources = []
+    destinations = []
+    try:
+        y0 = 0
+        for colors in chunks:
+            rows = classify_colors(colors)
+            start, stop = y0 * width, (y0 + len(rows)) * width
+            terrain[start:stop] = rows.ravel()
+            cost[start:stop] = terrain_costs(rows).ravel()
+            for y, x in np.argwhere(np.isin(rows, SOURCE_CODES)):
+                sources.append((int(x), int(y0 + y)))
+            for y, x in np.argwhere(np.isin(rows, DESTINATION_CODES)):
+                destinations.append((int(x), int(y0 + y)))
+            y0 += len(rows)
+        terrain.flush()
+        cost.flush()
+        del terrain, cost
+
+        # Same order as build_graph, which scans pixels column by column.
+        if not sources:
+            raise ValueError("No source pixel found in the image")
+        source_pixel = max(sources)
+        destinations.sort()
+        _finish_grid_file(temp_path, width, height, source_pixel, destinations, None)
+        os.replace(temp_path, grid_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return source_pixel, destinations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a BMP or TXT map into a memory-mappable grid file.")
+    parser.add_argument("map_path", help="uncompressed 24/32-bit BMP or TXT map")
+    parser.add_argument("grid_path", help="grid file to write")
+    parser.add_argument("--rows-per-chunk", type=int, default=ROWS_PER_CHUNK,
+                        help="map rows converted at once (default: %(default)s)")
+    args = parser.parse_args()
+
+    source, destinations = convert_map_to_grid(args.map_path, args.grid_path, args.rows_per_chunk)
+    print(f"Grid created successfully: {args.grid_path}")
+    print(f"Source: {source}, destinations: {len(destinations)}")
+
+
+if __name__ == "__main__":
+    main()
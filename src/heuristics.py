@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import weakref
+
+import numpy as np
+
+
+class Heuristic:
+    """Estimate of the remaining cost from a node to the closest goal.
+
+    Subclasses implement bind(), which receives the graph and the goals of one
+    search and returns the function a_star calls for every pushed node. All
+    heuristics below are consistent, so a_star stays optimal with them.
+    """
+
+    def bind(self, graph: Any, goals: List[Tuple[int, int]]) -> Callable[[Tuple[int, int]], float]:
+        raise NotImplementedError
+
+
+def _resolve_scale(scale: Optional[float], graph: Any) -> float:
+    """Return scale, or the cheapest edge weight of graph when scale is None."""
+    return graph.min_edge_weight() if scale is None else scale
+
+
+class ManhattanHeuristic(Heuristic):
+    """Manhattan distance to the closest goal, checking every goal per node.
+
+    Parameters:
+    - scale: Factor applied to the distance. The default of 1 is the original
+      estimate; None uses the cheapest edge weight of the graph, which is the
+      strongest admissible scale.
+    """
+
+    def __init__(self, scale: Optional[float] = 1) -> None:
+        self.scale = scale
+
+    def bind(self, graph, goals):
+        scale = _resolve_scale(self.scale, graph)
+        if len(goals) == 1:
+            (gx, gy), = goals
+            return lambda u: scale * (abs(u[0] - gx) + abs(u[1] - gy))
+
+        def heuristic(u):
+            ux, uy = u
+            return scale * min(abs(ux - dx) + abs(uy - dy) for dx, dy in goals)
+        return heuristic
+
+
+class _KDTree:
+    """2-d tree over pixels answering nearest-neighbor queries in Manhattan distance."""
+
+    def __init__(self, points: List[Tuple[int, int]]) -> None:
+        self.root = self._build(list(points), 0)
+
+    def _build(self, points, axis):
+        if not points:
+            return None
+        points.sort(key=lambda p: p[axis])
+        middle = len(points) // 2
+        return (
+            points[middle],
+            axis,
+            self._build(points[:middle], 1 - axis),
+            self._build(points[middle + 1:], 1 - axis)
+        )
+
+    def nearest_distance(self, point: Tuple[int, int]) -> int:
+        """Return the Manhattan distance from point to the closest stored pixel."""
+        best = float('inf')
+        px, py = point
+        # Each entry carries a lower bound on the distance to its subtree.
+        stack = [(self.root, 0)]
+        while stack:
+            node, bound = stack.pop()
+            if node is None or bound >= best:
+                continue
+            (nx, ny), axis, left, right = node
+            distance = abs(px - nx) + abs(py - ny)
+            if distance < best:
+                best = distance
+            offset = point[axis] - (nx, ny)[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            # The near side is pushed last so it is searched first.
+            stack.append((far, abs(offset)))
+            stack.append((near, 0))
+        return best
+
+
+class KDTreeHeuristic(Heuristic):
+    """Manhattan distance to the closest goal, found through a k-d tree of the goals.
+
+    Same estimates as ManhattanHeuristic, but each node costs about O(log k)
+    instead of O(k) for k goals.
+
+    Parameters:
+    - scale: As in ManhattanHeuristic; None uses the cheapest edge weight.
+    """
+
+    def __init__(self, scale: Optional[float] = None) -> None:
+        self.scale = scale
+
+    def bind(self, graph, goals):
+        scale = _resolve_scale(self.scale, graph)
+        tree = _KDTree(goals)
+        return lambda u: scale * tree.nearest_distance(u)
+
+
+class DistanceFieldHeuristic(Heuristic):
+    """Exact cost to the closest goal, from a multi-source Dijkstra run from the goals.
+
+    The distance field costs one full sweep of the graph to precompute, after
+    which a_star only expands nodes on optimal paths. The heuristic keeps the
+    fields of each graph for its current version only, so repeated queries
+    towards the same goals reuse them; they are freed along with the graph.
+
+    Parameters:
+    - max_cells: Cells held by the fields kept for one graph before the least
+      recently used field is dropped; the newest field is always kept.
+    """
+
+    def __init__(self, max_cells: int = 1 << 19) -> None:
+        self.max_cells = max_cells
+        # Graph -> (graph version, fields by frozenset of goals, least recently used first).
+        self._fields = weakref.WeakKeyDictionary()
+
+    def field(self, graph, goals) -> Dict[Tuple[int, int], float]:
+        """Return the distance field of goals on graph, computing it if needed."""
+        version, fields = self._fields.get(graph, (None, None))
+        if version != graph.version:
+            fields = OrderedDict()
+            self._fields[graph] = (graph.version, fields)
+        key = frozenset(goals)
+        if key in fields:
+            fields.move_to_end(key)
+            return fields[key]
+        distances = graph.dijkstra(goals)
+        fields[key] = distances
+        cells = sum(len(field) for field in fields.values())
+        while cells > self.max_cells and len(fields) > 1:
+            cells -= len(fields.popitem(last=False)[1])
+        return distances
+
+    def bind(self, graph, goals):
+        distances = self.field(graph, goals)
+        inf = float('inf')
+        return lambda u: distances.get(u, inf)
+
+
+class LandmarkHeuristic(Heuristic):
+    """ALT lower bound from the landmark distance tables of the graph.
+
+    For each goal t, the estimate at u is the largest |d(L, u) - d(L, t)| over
+    the landmarks L, and the heuristic is the smallest estimate over the goals.
+    The graph must have been preprocessed with GridGraph.build_landmarks, and
+    its edges must not have changed since.
+    """
+
+    def bind(self, graph, goals):
+        landmarks = getattr(graph, "landmarks", None)
+        if landmarks is None:
+            raise ValueError("The graph has no landmarks; call build_landmarks() first")
+        if landmarks.version != graph.version:
+            # Tables of older costs may overestimate, which breaks optimality.
+            raise ValueError("The landmarks are stale since the graph changed; call build_landmarks() again")
+        unreachable = landmarks.unreachable
+        width = graph.width
+        goal_columns = landmarks.tables[:, [y * width + x for x, y in goals]]
+        # Landmarks that cannot reach a goal give no information about it.
+        goal_known = goal_columns != unreachable
+        goal_columns = goal_columns.astype(np.int64)
+
+        def heuristic(u):
+            column = landmarks.tables[:, u[1] * width + u[0]]
+            known = goal_known & (column != unreachable)[:, None]
+            bounds = np.where(known, np.abs(goal_columns - column.astype(np.int64)[:, None]), 0)
+            return int(bounds.max(axis=0).min())
+        return heuristic
+
+
+# Heuristics selectable by name in a_star.
+HEURISTICS = {
+    "manhattan": ManhattanHeuristic(),
+    "weighted": ManhattanHeuristic(scale=None),
+    "kdtree": KDTreeHeuristic(),
+    "field": DistanceFieldHeuristic(),
+    "alt": LandmarkHeuristic(),
+}
+
+
+def get_heuristic(heuristic: Union[str, Heuristic, None]) -> Heuristic:
+    """Return a Heuristic given an instance, a name from HEURISTICS, or None (Manhattan).
+
+    Raises:
+    - ValueError: If the name is not in HEURISTICS.
+    """
+    if heuristic is None:
+        return HEURISTICS["manhattan"]
+    if isinstance(heuristic, Heuristic):
+        return heuristic
+    try:
+        return HEURISTICS[heuristic]
+    except KeyError:
+        raise ValueError(f"Unknown heuristic: {heuristic!r} (expected one of {sorted(HEURISTICS)})")
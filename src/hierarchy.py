@@ -0,0 +1,369 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import heapq
+import time
+
+import numpy as np
+
+from graph import reconstruct_path, record_search
+from heuristics import Heuristic, get_heuristic
+from search_stats import SearchStats
+
+
+class Hierarchy:
+    """HPA* abstraction of a GridGraph: square clusters linked through border entrances.
+
+    The grid is cut into clusters of cluster_size x cluster_size cells. Where
+    two neighboring clusters touch through passable cells, transitions (pairs
+    of cells facing each other across the border) become the entrances of
+    the abstract graph. Entrances of the same cluster are linked by the cost of
+    the shortest path between them that stays inside the cluster.
+
+    A query links the source and the destinations to the entrances of their
+    clusters, searches the abstract graph, then refines each abstract edge
+    into pixels with a search confined to one cluster.
+
+    With exact=False, a border run of passable cells gets one transition in
+    its middle (or one at each end when it is 6 cells or longer), which keeps
+    the abstract graph small but may return slightly longer paths. With
+    exact=True, every facing pair is a transition; any path then splits into
+    in-cluster segments between entrances, so the result is optimal.
+
+    Parameters:
+    - graph: The GridGraph the hierarchy was built on.
+    - cluster_size: Width and height of a cluster, in cells.
+    - exact: Whether every border crossing is a transition.
+    """
+
+    # Border runs at least this long get two transitions in the sparse mode.
+    LONG_RUN = 6
+
+    def __init__(self, graph, cluster_size: int = 16, exact: bool = False) -> None:
+        self.graph = graph
+        self.cluster_size = cluster_size
+        self.exact = exact
+        self.clusters_x = -(-graph.width // cluster_size)
+        self.clusters_y = -(-graph.height // cluster_size)
+        # Transitions (u, v) of each border, keyed by the (lower, higher) pair
+        # of cluster ids it separates; u lies in the lower cluster.
+        self.transitions = {}
+        # Entrances of each cluster and the in-cluster costs between them.
+        self.entrances = {}
+        self.edges = {}
+        self.version = graph.version
+
+    @classmethod
+    def build(cls, graph, cluster_size: int = 16, exact: bool = False) -> "Hierarchy":
+        """Find the transitions of every border and the in-cluster costs of every cluster.
+
+        Returns:
+        - The Hierarchy of the graph.
+        """
+        hierarchy = cls(graph, cluster_size, exact)
+        clusters = range(hierarchy.clusters_x * hierarchy.clusters_y)
+        for cluster in clusters:
+            for border in hierarchy._borders(cluster):
+                hierarchy.transitions[border] = hierarchy._find_transitions(*border)
+        hierarchy._refresh_clusters(clusters)
+        return hierarchy
+
+    def cluster_of(self, pixel: Tuple[int, int]) -> int:
+        """Return the id of the cluster containing a pixel (x, y)."""
+        x, y = pixel
+        return (y // self.cluster_size) * self.clusters_x + x // self.cluster_size
+
+    def bounds(self, cluster: int) -> Tuple[int, int, int, int]:
+        """Return the (x0, y0, x1, y1) cell bounds of a cluster, x1 and y1 excluded."""
+        cy, cx = divmod(cluster, self.clusters_x)
+        size = self.cluster_size
+        return (
+            cx * size,
+            cy * size,
+            min((cx + 1) * size, self.graph.width),
+            min((cy + 1) * size, self.graph.height)
+        )
+
+    def _neighbor_clusters(self, cluster: int) -> List[int]:
+        cy, cx = divmod(cluster, self.clusters_x)
+        neighbors = []
+        if cx > 0:
+            neighbors.append(cluster - 1)
+        if cx + 1 < self.clusters_x:
+            neighbors.append(cluster + 1)
+        if cy > 0:
+            neighbors.append(cluster - self.clusters_x)
+        if cy + 1 < self.clusters_y:
+            neighbors.append(cluster + self.clusters_x)
+        return neighbors
+
+    def _borders(self, cluster: int) -> List[Tuple[int, int]]:
+        """Return the borders of a cluster as (lower, higher) cluster id pairs."""
+        return [(min(cluster, other), max(cluster, other)) for other in self._neighbor_clusters(cluster)]
+
+    def _find_transitions(self, lower: int, higher: int) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """Return the (u, v) transitions across the border between two neighboring clusters."""
+        x0, y0, x1, y1 = self.bounds(lower)
+        if higher == lower + 1:
+            # Vertical border: u on the last column of lower, v on the first of higher.
+            pairs = [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+        else:
+            # Horizontal border: u on the last row of lower, v on the first of higher.
+            pairs = [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+
+        cost = self.graph.cost
+        width = self.graph.width
+        open_pair = [
+            bool(cost[u[1] * width + u[0]]) and bool(cost[v[1] * width + v[0]])
+            for u, v in pairs
+        ]
+        if self.exact:
+            return [pair for pair, is_open in zip(pairs, open_pair) if is_open]
+
+        transitions = []
+        start = None
+        for i, is_open in enumerate(open_pair + [False]):
+            if is_open and start is None:
+                start = i
+            elif not is_open and start is not None:
+                if i - start >= self.LONG_RUN:
+                    transitions += [pairs[start], pairs[i - 1]]
+                else:
+                    transitions.append(pairs[(start + i - 1) // 2])
+                start = None
+        return transitions
+
+    def _collect_entrances(self, cluster: int) -> Set[Tuple[int, int]]:
+        """Return the cells of cluster that take part in a transition."""
+        entrances = set()
+        for lower, higher in self._borders(cluster):
+            for u, v in self.transitions[(lower, higher)]:
+                entrances.add(u if cluster == lower else v)
+        return entrances
+
+    def _refresh_clusters(self, clusters: Iterable[int]) -> None:
+        """Recollect the entrances of clusters from the transitions and recompute their costs."""
+        for cluster in clusters:
+            entrances = self._collect_entrances(cluster)
+            self.entrances[cluster] = entrances
+            self.edges[cluster] = {}
+            for entrance in entrances:
+                distances, _ = self._cluster_search(entrance, cluster, entrances)
+                self.edges[cluster][entrance] = {
+                    other: cost for other, cost in distances.items() if other in entrances and other != entrance
+                }
+
+    def update(self, pixels: Iterable[Tuple[int, int]]) -> None:
+        """Bring the hierarchy up to date after the costs of some pixels changed.
+
+        Only the borders of the clusters holding the pixels are scanned again,
+        and only those clusters and their neighbors get new in-cluster costs.
+        """
+        changed = {self.cluster_of(pixel) for pixel in pixels}
+        for cluster in changed:
+            for border in self._borders(cluster):
+                self.transitions[border] = self._find_transitions(*border)
+        affected = set(changed)
+        for cluster in changed:
+            affected.update(self._neighbor_clusters(cluster))
+        self._refresh_clusters(affected)
+        self.version = self.graph.version
+
+    def _cluster_search(
+        self,
+        source: Tuple[int, int],
+        cluster: int,
+        targets: Set[Tuple[int, int]],
+        stats: Optional[SearchStats] = None
+    ) -> Tuple[Dict[Tuple[int, int], float], Dict[Tuple[int, int], Tuple[int, int]]]:
+        """Dijkstra from source that never leaves cluster and stops once all targets are settled.
+
+        Parameters:
+        - stats: Optional SearchStats receiving the counters of this search, and
+          whose on_expand hook sees every expanded node.
+
+        Returns:
+        - The settled costs and the predecessor tree.
+        """
+        x0, y0, x1, y1 = self.bounds(cluster)
+        graph = self.graph
+        neighbors = graph.neighbors
+        remaining = set(targets)
+        remaining.discard(source)
+        distances = {}
+        came_from = {}
+        g_score = {source: 0}
+        open_set = [(0, source)]
+        pushed = 1
+        start = time.perf_counter() if stats is not None else 0.0
+        on_expand = stats.on_expand if stats is not None else None
+        peak_open = 1
+        while open_set and (remaining or not distances):
+            cost, current = heapq.heappop(open_set)
+            if current in distances:
+                continue
+            distances[current] = cost
+            remaining.discard(current)
+            for (nx, ny), weight in neighbors(current).items():
+                neighbor = (nx, ny)
+                if not (x0 <= nx < x1 and y0 <= ny < y1) or neighbor in distances:
+                    continue
+                tentative_g_score = cost + weight
+                if tentative_g_score < g_score.get(neighbor, float('inf')):
+                    g_score[neighbor] = tentative_g_score
+                    heapq.heappush(open_set, (tentative_g_score, neighbor))
+                    pushed += 1
+                    came_from[neighbor] = current
+            if stats is not None:
+                peak_open = max(peak_open, len(open_set))
+                if on_expand is not None:
+                    on_expand(graph, current, cost)
+        if stats is not None:
+            record_search(stats, start, len(distances), pushed, len(open_set), peak_open)
+        return distances, came_from
+
+    def a_star(self,
+        source_pixel: Tuple[int, int],
+        destination_pixels: List[Tuple[int, int]],
+        heuristic: Union[str, Heuristic, None] = None,
+        stats: Optional[SearchStats] = None
+    ) -> List[Tuple[int, int]]:
+        """Hierarchical search with the same parameters and result type as Graph.a_star.
+
+        The counters of the linking searches, the abstract search and the
+        refinement all add up in stats, as a single search. The on_expand hook
+        sees the expanded pixels of all of them.
+        """
+        start = time.perf_counter() if stats is not None else 0.0
+        # Every part records into parts; stats then gets them as one search.
+        parts = SearchStats(on_expand=stats.on_expand) if stats is not None else None
+        goals = set(destination_pixels)
+        if source_pixel in goals:
+            if stats is not None:
+                record_search(stats, start, 0, 1, 0, 1, goal_pops=1)
+            return [source_pixel]
+        # Edges that only exist for this query, keyed by their start pixel.
+        extra = {}
+        source_cluster = self.cluster_of(source_pixel)
+        source_targets = self.entrances[source_cluster] | {g for g in goals if self.cluster_of(g) == source_cluster}
+        distances, _ = self._cluster_search(source_pixel, source_cluster, source_targets, parts)
+        extra[source_pixel] = {t: cost for t, cost in distances.items() if t in source_targets and t != source_pixel}
+        for goal in goals:
+            cluster = self.cluster_of(goal)
+            if goal in self.entrances[cluster]:
+                continue
+            # Grid edges weigh the same both ways, so costs from the goal are costs to it.
+            distances, _ = self._cluster_search(goal, cluster, self.entrances[cluster], parts)
+            for entrance in self.entrances[cluster]:
+                if entrance in distances:
+                    extra.setdefault(entrance, {})[goal] = distances[entrance]
+
+        estimate = get_heuristic(heuristic).bind(self.graph, destination_pixels)
+        open_set = [(0, source_pixel)]
+        came_from = {}
+        g_score = {source_pixel: 0}
+        closed = set()
+        pushed = 1
+        abstract_start = time.perf_counter() if stats is not None else 0.0
+        on_expand = stats.on_expand if stats is not None else None
+        peak_open = 1
+        goal_pops = 0
+        abstract_path = []
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            if current in goals:
+                abstract_path = reconstruct_path(came_from, current)
+                goal_pops = 1
+                break
+            closed.add(current)
+            current_g = g_score[current]
+            for neighbor, weight in self._abstract_neighbors(current, extra).items():
+                if neighbor in closed:
+                    continue
+                tentative_g_score = current_g + weight
+                if tentative_g_score < g_score.get(neighbor, float('inf')):
+                    g_score[neighbor] = tentative_g_score
+                    heapq.heappush(open_set, (tentative_g_score + estimate(neighbor), neighbor))
+                    pushed += 1
+                    came_from[neighbor] = current
+            if stats is not None:
+                peak_open = max(peak_open, len(open_set))
+                if on_expand is not None:
+                    on_expand(self.graph, current, current_g)
+        if stats is not None:
+            record_search(parts, abstract_start, len(closed), pushed, len(open_set), peak_open, goal_pops)
+
+        path = abstract_path[:1]
+        for u, v in zip(abstract_path[:-1], abstract_path[1:]):
+            if abs(u[0] - v[0]) + abs(u[1] - v[1]) == 1 and self.cluster_of(u) != self.cluster_of(v):
+                path.append(v)
+                continue
+            _, refined = self._cluster_search(u, self.cluster_of(u), {v}, parts)
+            path.extend(reconstruct_path(refined, v)[1:])
+        if stats is not None:
+            stats.record(
+                expanded=parts.expanded, pushed=parts.pushed, popped=parts.popped, stale=parts.stale,
+                peak_open=parts.peak_open, seconds=time.perf_counter() - start)
+        return path
+
+    def _abstract_neighbors(
+        self,
+        node: Tuple[int, int],
+        extra: Dict[Tuple[int, int], Dict[Tuple[int, int], float]]
+    ) -> Dict[Tuple[int, int], float]:
+        """Return the abstract edges out of node: in-cluster, across borders and query-only."""
+        cluster = self.cluster_of(node)
+        neighbors = dict(self.edges[cluster].get(node, {}))
+        if node in self.entrances[cluster]:
+            for neighbor, weight in self.graph.neighbors(node).items():
+                other = self.cluster_of(neighbor)
+                if other != cluster and neighbor in self.entrances[other]:
+                    neighbors[neighbor] = weight
+        neighbors.update(extra.get(node, {}))
+        return neighbors
+
+    def save(self, file_path: str) -> None:
+        """Write the transitions and in-cluster costs to an uncompressed .npz file."""
+        transitions = [
+            (u[0], u[1], v[0], v[1])
+            for pairs in self.transitions.values() for u, v in pairs
+        ]
+        edges = [
+            (u[0], u[1], v[0], v[1], cost)
+            for cluster_edges in self.edges.values()
+            for u, costs in cluster_edges.items() for v, cost in costs.items()
+        ]
+        np.savez(
+            file_path,
+            cluster_size=np.array(self.cluster_size),
+            exact=np.array(self.exact),
+            transitions=np.array(transitions, dtype=np.int64).reshape(-1, 4),
+            edges=np.array(edges, dtype=np.int64).reshape(-1, 5),
+            fingerprint=np.array(self.graph.fingerprint())
+        )
+
+    @classmethod
+    def load(cls, file_path: str, graph) -> "Hierarchy":
+        """Load a hierarchy saved by save() for graph.
+
+        Raises:
+        - ValueError: If the hierarchy was built for a different graph.
+        """
+        with np.load(file_path) as data:
+            if str(data["fingerprint"]) != graph.fingerprint():
+                raise ValueError(f"Hierarchy in {file_path} was built for a different graph")
+            hierarchy = cls(graph, int(data["cluster_size"]), bool(data["exact"]))
+            clusters = range(hierarchy.clusters_x * hierarchy.clusters_y)
+            for cluster in clusters:
+                for border in hierarchy._borders(cluster):
+                    hierarchy.transitions[border] = []
+            for ux, uy, vx, vy in data["transitions"].tolist():
+                u, v = (ux, uy), (vx, vy)
+                hierarchy.transitions[(hierarchy.cluster_of(u), hierarchy.cluster_of(v))].append((u, v))
+            for cluster in clusters:
+                hierarchy.entrances[cluster] = hierarchy._collect_entrances(cluster)
+                hierarchy.edges[cluster] = {entrance: {} for entrance in hierarchy.entrances[cluster]}
+            for ux, uy, vx, vy, cost in data["edges"].tolist():
+                u = (ux, uy)
+                hierarchy.edges[hierarchy.cluster_of(u)][u][(vx, vy)] = cost
+        return hierarchy
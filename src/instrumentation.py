@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+import json
+import time
+
+import numpy as np
+from PIL import Image
+
+from search_stats import SearchStats
+
+
+class Profiler:
+    """Wall-clock time of the phases of a run, such as load, search and render.
+
+    Entering a phase again adds to its time, so a phase may wrap several
+    separate pieces of work.
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the body of a with statement as part of the phase name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(self.phases)
+
+    def __repr__(self) -> str:
+        return "Profiler(" + ", ".join(f"{name}={seconds:.4f}s" for name, seconds in self.phases.items()) + ")"
+
+
+def _map_shape(graph: Any) -> Tuple[int, int]:
+    """Return (height, width) of a GridGraph, or of the image of a Graph."""
+    if hasattr(graph, "width"):
+        return graph.height, graph.width
+    width, height = graph.image.size
+    return height, width
+
+
+class ExpansionHeatmap:
+    """SearchStats.on_expand hook counting how many times each pixel of each graph is expanded.
+
+    Usage:
+        heatmap = ExpansionHeatmap()
+        stats = SearchStats(on_expand=heatmap)
+        graph.a_star(source, [target], stats=stats)
+        heatmap.image(graph).save("heatmap.png")
+    """
+
+    def __init__(self) -> None:
+        # Counts per graph, keyed by id(graph); the graph is kept alive with them.
+        self._counts: Dict[int, Tuple[Any, np.ndarray]] = {}
+
+    def __call__(self, graph: Any, node: Tuple[int, int], g: float) -> None:
+        entry = self._counts.get(id(graph))
+        if entry is None:
+            entry = self._counts[id(graph)] = (graph, np.zeros(_map_shape(graph), dtype=np.uint32))
+        entry[1][node[1], node[0]] += 1
+
+    def counts(self, graph: Any) -> np.ndarray:
+        """Return the (height, width) expansion counts of graph (zeros if it was never searched)."""
+        entry = self._counts.get(id(graph))
+        return np.zeros(_map_shape(graph), dtype=np.uint32) if entry is None else entry[1]
+
+    def image(self, graph: Any) -> Image.Image:
+        """Draw the expansion counts of graph in red over a dimmed copy of its map.
+
+        The intensity grows with the logarithm of the count, so cells expanded
+        once stay visible next to those expanded many times.
+        """
+        counts = self.counts(graph)
+        colors = graph.colors().astype(np.float32) * 0.35
+        if counts.any():
+            heat = np.log1p(counts.astype(np.float32))
+            heat /= heat.max()
+            expanded = counts > 0
+            colors[expanded, 0] = 80 + 175 * heat[expanded]
+            colors[expanded, 1] *= 1 - heat[expanded]
+            colors[expanded, 2] *= 1 - heat[expanded]
+        return Image.fromarray(colors.astype(np.uint8), 'RGB')
+
+
+def export_json(
+    file_path: str,
+    stats: Optional[Dict[str, SearchStats]] = None,
+    profiler: Optional[Profiler] = None,
+    **extra: Any
+) -> None:
+    """Write search counters, phase timings and any extra JSON-serializable values to a file.
+
+    Parameters:
+    - stats: SearchStats by name, e.g. one per journey.
+    - profiler: Phase timings of the run.
+    - extra: Other top-level entries, such as the journey cost.
+    """
+    document = dict(extra)
+    if profiler is not None:
+        document["phases"] = profiler.to_dict()
+    if stats is not None:
+        document["searches"] = {name: counters.to_dict() for name, counters in stats.items()}
+    with open(file_path, "w") as file:
+        json.dump(document, file, indent=2)
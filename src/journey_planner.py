@@ -0,0 +1,159 @@
+from typing import List, Optional, Tuple
+
+from graph import Graph
+from search_stats import SearchStats
+
+
+# Largest number of intermediate stops solved exactly with Held-Karp.
+EXACT_LIMIT = 12
+
+
+def cost_matrix(
+    graph: Graph,
+    pixels: List[Tuple[int, int]],
+    stats: Optional[SearchStats] = None
+) -> List[List[float]]:
+    """Compute the shortest-path cost between every pair of pixels.
+
+    Runs one multi-target Graph.shortest_paths sweep per pixel. Unreachable
+    pairs cost float('inf'). stats, if given, receives the counters of every sweep.
+
+    Returns:
+        matrix[i][j] is the cost of the shortest path from pixels[i] to pixels[j].
+    """
+    matrix = []
+    for source in pixels:
+        costs, _ = graph.shortest_paths(source, pixels, stats)
+        matrix.append([costs.get(target, float('inf')) for target in pixels])
+    return matrix
+
+
+def route_cost(matrix: List[List[float]], order: List[int]) -> float:
+    """Return the cost of visiting the matrix nodes in the given order."""
+    return sum(matrix[a][b] for a, b in zip(order[:-1], order[1:]))
+
+
+def held_karp(matrix: List[List[float]]) -> Tuple[float, List[int]]:
+    """Exact cheapest route from node 0 to the last node through all others.
+
+    Dynamic programming over the subsets of intermediate nodes, in
+    O(2^n * n^2) time for n intermediate nodes.
+
+    Returns:
+        A tuple (cost, order) where order starts with 0 and ends with the last node.
+    """
+    last = len(matrix) - 1
+    stops = list(range(1, last))
+    if not stops:
+        return matrix[0][last], [0, last]
+
+    # best[mask][k]: cheapest route from 0 through the stops in mask, ending at stops[k].
+    full = 1 << len(stops)
+    inf = float('inf')
+    best = [[inf] * len(stops) for _ in range(full)]
+    parent = [[-1] * len(stops) for _ in range(full)]
+    for k, stop in enumerate(stops):
+        best[1 << k][k] = matrix[0][stop]
+
+    for mask in range(1, full):
+        row = best[mask]
+        for k, stop in enumerate(stops):
+            cost = row[k]
+            if cost == inf or not mask & (1 << k):
+                continue
+            for n, following in enumerate(stops):
+                if mask & (1 << n):
+                    continue
+                next_mask = mask | (1 << n)
+                candidate = cost + matrix[stop][following]
+                if candidate < best[next_mask][n]:
+                    best[next_mask][n] = candidate
+                    parent[next_mask][n] = k
+
+    mask = full - 1
+    total, k = min((best[mask][k] + matrix[stop][last], k) for k, stop in enumerate(stops))
+    order = [last]
+    while k != -1:
+        order.append(stops[k])
+        mask, k = mask ^ (1 << k), parent[mask][k]
+    order.append(0)
+    order.reverse()
+    return total, order
+
+
+def nearest_neighbor_order(matrix: List[List[float]]) -> List[int]:
+    """Greedy route from node 0 to the last node, always moving to the closest unvisited stop."""
+    last = len(matrix) - 1
+    unvisited = set(range(1, last))
+    order = [0]
+    while unvisited:
+        current = order[-1]
+        following = min(unvisited, key=lambda n: (matrix[current][n], n))
+        unvisited.remove(following)
+        order.append(following)
+    order.append(last)
+    return order
+
+
+def improve_order(matrix: List[List[float]], order: List[int]) -> List[int]:
+    """Improve a route with 2-opt and Or-opt moves until neither finds a gain.
+
+    The first and last nodes stay fixed. 2-opt reverses a stretch of the route,
+    which assumes a symmetric matrix, as the cost matrix of an undirected graph
+    is. Or-opt moves a run of one to three stops elsewhere without reversing it.
+    """
+    order = list(order)
+    improved = True
+    while improved:
+        improved = False
+
+        # 2-opt: reverse order[i..j].
+        for i in range(1, len(order) - 2):
+            for j in range(i + 1, len(order) - 1):
+                a, b, c, d = order[i - 1], order[i], order[j], order[j + 1]
+                delta = matrix[a][c] + matrix[b][d] - matrix[a][b] - matrix[c][d]
+                if delta < 0:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+
+        # Or-opt: move order[i..i+length-1] between two other consecutive nodes.
+        for length in (1, 2, 3):
+            i = 1
+            while i + length < len(order):
+                segment = order[i:i + length]
+                before, after = order[i - 1], order[i + length]
+                removal_gain = matrix[before][segment[0]] + matrix[segment[-1]][after] - matrix[before][after]
+                rest = order[:i] + order[i + length:]
+                best_delta, best_position = 0, None
+                for position in range(1, len(rest)):
+                    x, y = rest[position - 1], rest[position]
+                    delta = matrix[x][segment[0]] + matrix[segment[-1]][y] - matrix[x][y] - removal_gain
+                    if delta < best_delta:
+                        best_delta, best_position = delta, position
+                if best_position is not None:
+                    order = rest[:best_position] + segment + rest[best_position:]
+                    improved = True
+                i += 1
+    return order
+
+
+def plan_route(matrix: List[List[float]], exact_limit: int = EXACT_LIMIT) -> Tuple[float, List[int]]:
+    """Order the intermediate nodes of matrix on a route from node 0 to the last node.
+
+    Uses Held-Karp when there are at most exact_limit intermediate nodes, and a
+    nearest-neighbor route refined by 2-opt/Or-opt otherwise.
+
+    Returns:
+        A tuple (cost, order) where order starts with 0 and ends with the last node.
+
+    Raises:
+        ValueError: If no route visits every node, i.e. some node is unreachable.
+    """
+    if len(matrix) - 2 <= exact_limit:
+        cost, order = held_karp(matrix)
+    else:
+        order = improve_order(matrix, nearest_neighbor_order(matrix))
+        cost = route_cost(matrix, order)
+    if cost == float('inf') or len(order) != len(matrix):
+        raise ValueError("No route from the first to the last node visits every node")
+    return cost, order
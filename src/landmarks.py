@@ -0,0 +1,114 @@
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+
+# Table entry of the cells a landmark cannot reach.
+UNREACHABLE = np.iinfo(np.uint64).max
+
+
+class Landmarks:
+    """ALT preprocessing: exact distances from a few landmark pixels to every cell.
+
+    For an undirected graph, the triangle inequality gives
+    |d(L, u) - d(L, t)| <= d(u, t) for every landmark L, which LandmarkHeuristic
+    turns into a lower bound for a_star. The tables are flat arrays indexed like
+    the GridGraph cost grid, one row per landmark.
+
+    Parameters:
+    - landmarks: The landmark pixels.
+    - tables: Array of shape (len(landmarks), width * height) with the distance
+      from each landmark to each cell (UNREACHABLE where there is no path).
+    - fingerprint: GridGraph.fingerprint() of the graph the tables were built on.
+    - version: Graph.version the tables hold for; LandmarkHeuristic refuses
+      tables of any other version.
+    """
+
+    def __init__(
+        self,
+        landmarks: List[Tuple[int, int]],
+        tables: np.ndarray,
+        fingerprint: str,
+        version: Any = None
+    ) -> None:
+        self.landmarks = landmarks
+        self.tables = tables
+        self.fingerprint = fingerprint
+        self.version = version
+
+    @classmethod
+    def build(cls, graph, count: int = 8, start: Optional[Tuple[int, int]] = None) -> "Landmarks":
+        """Select landmarks by farthest-point sampling and compute their distance tables.
+
+        The first landmark is the cell farthest from start; each next one is the
+        cell whose distance to its closest landmark so far is the largest. Only
+        the connected component of start is covered.
+
+        Parameters:
+        - graph: The GridGraph to preprocess.
+        - count: Number of landmarks.
+        - start: Any traversable pixel; defaults to the first one of the graph.
+
+        Returns:
+        - The Landmarks of the graph.
+        """
+        if start is None:
+            start = next(iter(graph.adj))
+        size = graph.width * graph.height
+
+        def table_from(pixel):
+            table = np.full(size, UNREACHABLE, dtype=np.uint64)
+            for (x, y), distance in graph.dijkstra([pixel]).items():
+                table[y * graph.width + x] = distance
+            return table
+
+        # Distance from every cell to the closest landmark (to start, at first).
+        closest = table_from(start)
+        landmarks = []
+        tables = []
+        for _ in range(count):
+            scores = np.where(closest != UNREACHABLE, closest, 0)
+            candidate = int(np.argmax(scores))
+            if landmarks and scores[candidate] == 0:
+                # Every reachable cell already is a landmark.
+                break
+            landmark = graph.pixel(candidate)
+            table = table_from(landmark)
+            landmarks.append(landmark)
+            tables.append(table)
+            closest = table if len(landmarks) == 1 else np.minimum(closest, table)
+
+        tables = np.stack(tables)
+        # Shrink to 32 bits when every finite distance fits.
+        finite = tables[tables != UNREACHABLE]
+        if finite.size == 0 or finite.max() < np.iinfo(np.uint32).max:
+            tables = np.where(tables == UNREACHABLE, np.iinfo(np.uint32).max, tables).astype(np.uint32)
+        return cls(landmarks, tables, graph.fingerprint(), graph.version)
+
+    @property
+    def unreachable(self) -> int:
+        """Table entry of unreachable cells for the dtype of the tables."""
+        return int(np.iinfo(self.tables.dtype).max)
+
+    def save(self, file_path: str) -> None:
+        """Write the landmarks and their tables to an uncompressed .npz file."""
+        np.savez(
+            file_path,
+            landmarks=np.array(self.landmarks, dtype=np.int64).reshape(-1, 2),
+            tables=self.tables,
+            fingerprint=np.array(self.fingerprint)
+        )
+
+    @classmethod
+    def load(cls, file_path: str, graph) -> "Landmarks":
+        """Load landmarks saved by save() for graph.
+
+        Raises:
+        - ValueError: If the tables were built for a different graph.
+        """
+        with np.load(file_path) as data:
+            fingerprint = str(data["fingerprint"])
+            if fingerprint != graph.fingerprint():
+                raise ValueError(f"Landmarks in {file_path} were built for a different graph")
+            landmarks = [(int(x), int(y)) for x, y in data["landmarks"]]
+            return cls(landmarks, data["tables"], fingerprint, graph.version)
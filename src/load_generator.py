@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from batch import DEFAULT_MAP_FILES
+from grid_graph import GridGraph
+from load_graphs import load_all_graphs
+from path_service import percentile
+
+
+def build_requests(graphs_info: Dict[str, Dict], count: int, distinct: int, journey_share: float, seed: int) -> List[Tuple[str, Dict]]:
+    """Draw count (endpoint, body) requests from a pool of distinct ones.
+
+    A small pool repeats queries, which exercises the coalescing and the result
+    cache of the service; a pool as large as count mostly misses them.
+    """
+    rng = random.Random(seed)
+    names = list(graphs_info)
+    dungeons = [name for name in names if name != "main"]
+    nodes = {name: list(info["graph"].adj) for name, info in graphs_info.items()}
+
+    pool = []
+    for _ in range(distinct):
+        if rng.random() < journey_share:
+            pool.append(("/journey", {
+                "start": list(rng.choice(nodes["main"])),
+                "dungeons": rng.sample(dungeons, rng.randint(0, len(dungeons))),
+                "strategy": rng.choice(["greedy", "planned"])
+            }))
+        else:
+            name = rng.choice(names)
+            pool.append(("/path", {
+                "map": name,
+                "source": list(rng.choice(nodes[name])),
+                "destinations": [list(rng.choice(nodes[name]))]
+            }))
+    return [rng.choice(pool) for _ in range(count)]
+
+
+async def open_connection(host: str, port: int, unix_socket: Optional[str]):
+    if unix_socket is not None:
+        return await asyncio.open_unix_connection(unix_socket)
+    return await asyncio.open_connection(host, port)
+
+
+async def send(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, target: str, body: Optional[Dict] = None) -> Tuple[int, Dict]:
+    """Send one HTTP request on a keep-alive connection and return (status, JSON reply)."""
+    payload = b"" if body is None else json.dumps(body).encode("utf-8")
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def run_load(requests: List[Tuple[str, Dict]], concurrency: int, host: str, port: int, unix_socket: Optional[str]) -> Dict:
+    """Send the requests over concurrency connections and collect client-side latencies."""
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+    latencies = []
+    failures = []
+
+    async def client():
+        reader, writer = await open_connection(host, port, unix_socket)
+        try:
+            while not queue.empty():
+                target, body = queue.get_nowait()
+                start = time.perf_counter()
+                status, reply = await send(reader, writer, "POST", target, body)
+                latencies.append(time.perf_counter() - start)
+                if status != 200 or reply.get("error"):
+                    failures.append((status, reply.get("error")))
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await open_connection(host, port, unix_socket)
+    _, server_stats = await send(reader, writer, "GET", "/stats")
+    writer.close()
+    return {"elapsed": elapsed, "latencies": sorted(latencies), "failures": failures, "server": server_stats}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive path_service.py with concurrent random queries.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", help="connect to this Unix socket instead of TCP")
+    parser.add_argument("--requests", type=int, default=1000, help="requests to send (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=32, help="open connections (default: %(default)s)")
+    parser.add_argument("--distinct", type=int, default=200, help="distinct queries to draw from (default: %(default)s)")
+    parser.add_argument("--journeys", type=float, default=0.1, help="share of journey queries (default: %(default)s)")
+    parser.add_argument("--cache-dir", default="../Datasets/cache", help="grid cache directory (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    graphs_info = load_all_graphs(DEFAULT_MAP_FILES, graph_class=GridGraph, cache_dir=args.cache_dir)
+    requests = build_requests(graphs_info, args.requests, args.distinct, args.journeys, args.seed)
+    result = asyncio.run(run_load(requests, args.concurrency, args.host, args.port, args.unix_socket))
+
+    latencies = result["latencies"]
+    print(f"{len(latencies)} requests in {result['elapsed']:.2f}s "
+          f"({len(latencies) / result['elapsed']:.1f} requests/s, {len(result['failures'])} failed)")
+    print("client latency ms: " + ", ".join(
+        f"{name}={percentile(latencies, fraction) * 1000:.2f}"
+        for name, fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99), ("max", 1.0))
+    ))
+    print("server stats: " + json.dumps(result["server"]))
+    for status, error in result["failures"][:5]:
+        print(f"  failed ({status}): {error}")
+
+
+if __name__ == "__main__":
+    main()
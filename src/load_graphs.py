@@ -1,30 +1,306 @@
-from typing import Dict
-from graph import Graph
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple, Type
+import hashlib
+import os
 
+import numpy as np
+from PIL import Image
 
-def load_all_graphs(map_files: Dict[str, str]) -> Dict[str, Dict]:
+from colors import Colors
+from distance_fields import DistanceFields
+from graph import COLOR_WEIGHTS, Graph
+from grid_graph import GridGraph
+from grid_store import MAGIC, load_grid, read_grid_header, save_grid
+
+
+def load_all_graphs(
+    map_files: Dict[str, str],
+    graph_class: Type[Graph] = Graph,
+    cache_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    distance_fields: bool = False
+) -> Dict[str, Dict]:
     """Builds all graph structures from map files and stores their metadata.
 
     Processes each map file to create a graph representation of the game world,
     identifying key locations (source and destinations) for pathfinding purposes.
+    Text maps (".txt") are read straight from their character grid, binary grid
+    files (".grid", see grid_store) are memory-mapped as GridGraphs, and any
+    other file is decoded as an image.
 
     Parameters:
         map_files: Dictionary mapping graph names to their corresponding file paths.
-            Example: {"main": "overworld.bmp", "dungeon1": "dungeon1.bmp"}
+            Example: {"main": "overworld.txt", "dungeon1": "dungeon1.bmp"}
+        graph_class: Graph implementation to build. Pass GridGraph for the compact,
+            array-backed representation of large maps.
+        cache_dir: Optional directory for built grids (GridGraph only). Each map is
+            stored under a hash of its content and of the weight table, and later
+            runs memory-map the stored grid instead of parsing the map again.
+        workers: Number of worker processes building the maps in parallel (GridGraph
+            only). Each worker hands its terrain and cost grids back through shared
+            memory. None or 1 builds the maps one after another.
+        distance_fields: Also give every graph distance fields towards its source
+            and destinations (GridGraph only, see attach_distance_fields).
 
     Returns:
         A dictionary where each key is a graph name and each value contains:
             - "graph": Graph object representing the map
             - "source": Starting pixel coordinates (Link's position or dungeon entrance)
             - "destinations": List of target pixels (dungeon entrances, pendants, Master Sword)
+
+    Raises:
+        ValueError: If cache_dir, workers or distance_fields is given for a graph
+            class other than GridGraph.
     """
-    graphs_info = {}
-    for name, path in map_files.items():
-        g = Graph()
-        source, destinations = g.build_graph(path)
-        graphs_info[name] = {
+    if cache_dir is not None:
+        if not issubclass(graph_class, GridGraph):
+            raise ValueError("Graph caching requires GridGraph")
+        os.makedirs(cache_dir, exist_ok=True)
+    if distance_fields and not issubclass(graph_class, GridGraph):
+        raise ValueError("Distance fields require GridGraph")
+
+    if workers is not None and workers > 1:
+        if not issubclass(graph_class, GridGraph):
+            raise ValueError("Parallel loading requires GridGraph")
+        graphs_info = _load_all_graphs_parallel(map_files, cache_dir, workers, graph_class)
+    else:
+        graphs_info = {}
+        for name, path in map_files.items():
+            if cache_dir is not None and not path.lower().endswith(".grid"):
+                graphs_info[name] = load_cached_graph(path, cache_dir)
+            else:
+                graphs_info[name] = build_graph_info(path, graph_class)
+
+    if distance_fields:
+        for name, info in graphs_info.items():
+            attach_distance_fields(info, map_files[name], cache_dir)
+    return graphs_info
+
+
+def build_graph_info(path: str, graph_class: Type[Graph] = Graph) -> Dict:
+    """Build the graph of a single map file.
+
+    Returns:
+        A dictionary with the "graph", "source" and "destinations" of the map.
+    """
+    if path.lower().endswith(".grid"):
+        g, source, destinations = load_grid(path)
+        return {
             "graph": g,
             "source": source,
             "destinations": destinations
         }
+
+    g = graph_class()
+    if path.lower().endswith(".txt"):
+        source, destinations = g.build_graph_from_txt(path)
+    else:
+        source, destinations = g.build_graph(path)
+    return {
+        "graph": g,
+        "source": source,
+        "destinations": destinations
+    }
+
+
+def map_cache_key(path: str) -> str:
+    """Hash a map file together with everything that shapes its graph.
+
+    The key covers the file content, the grid file format, the color weight
+    table and the character to color mapping, so changing any of them yields
+    a different key.
+    """
+    digest = hashlib.sha256()
+    digest.update(MAGIC)
+    digest.update(repr(sorted(COLOR_WEIGHTS.items())).encode())
+    digest.update(repr(sorted(Colors.char_to_color.items())).encode())
+    digest.update(os.path.splitext(path)[1].lower().encode())
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_cached_graph(path: str, cache_dir: str) -> Dict:
+    """Load the GridGraph of a map from the cache, building and storing it on a miss.
+
+    Returns:
+        A dictionary with the "graph", "source" and "destinations" of the map.
+    """
+    key = map_cache_key(path)
+    cache_path = os.path.join(cache_dir, f"{key}.grid")
+    try:
+        if read_grid_header(cache_path).get("key") == key:
+            graph, source, destinations = load_grid(cache_path)
+            return {
+                "graph": graph,
+                "source": source,
+                "destinations": destinations
+            }
+    except (OSError, ValueError):
+        # Missing or unreadable entry: rebuild it below.
+        pass
+
+    info = build_graph_info(path, GridGraph)
+    save_grid(cache_path, info["graph"], info["source"], info["destinations"], key=key)
+    return info
+
+
+def attach_distance_fields(info: Dict, path: str, cache_dir: Optional[str] = None) -> DistanceFields:
+    """Give the GridGraph of a loaded map distance fields towards its source and destinations.
+
+    The fields are stored next to the cached grid of the map in cache_dir, or
+    next to the map itself for ".grid" files, and later loads read each field
+    only when its target is first queried. Missing or stale files are rebuilt.
+    Without a place to store them, the fields are only built in memory.
+
+    Parameters:
+        info: A "graph", "source" and "destinations" dictionary, as returned by
+            load_all_graphs
+        path: The map file info was loaded from
+        cache_dir: Optional cache directory of load_all_graphs
+
+    Returns:
+        The DistanceFields now stored in the graph
+    """
+    graph = info["graph"]
+    targets = [info["source"]] + list(info["destinations"])
+    if path.lower().endswith(".grid"):
+        fields_path = f"{path}.fields.npz"
+    elif cache_dir is not None:
+        fields_path = os.path.join(cache_dir, f"{map_cache_key(path)}.fields.npz")
+    else:
+        return graph.build_distance_fields(targets)
+
+    try:
+        fields = DistanceFields.load(fields_path, graph)
+        if all(target in fields.targets for target in targets):
+            graph.distance_fields = fields
+            return fields
+    except (OSError, ValueError, KeyError):
+        # Missing, unreadable or stale fields: rebuild them below.
+        pass
+
+    fields = graph.build_distance_fields(targets)
+    # Same write-then-rename as save_grid, so readers never see a partial file.
+    temp_path = f"{fields_path}.{os.getpid()}.tmp.npz"
+    fields.save(temp_path)
+    os.replace(temp_path, fields_path)
+    return fields
+
+
+def _map_size(path: str) -> Tuple[int, int]:
+    """Return the (width, height) of a TXT or image map without building it."""
+    if path.lower().endswith(".txt"):
+        with open(path, "r") as file:
+            width = len(file.readline().strip())
+            height = 1 + sum(1 for _ in file)
+        return width, height
+    with Image.open(path) as image:
+        return image.size
+
+
+def _build_into_shared_memory(
+    path: str,
+    cache_dir: Optional[str],
+    graph_class: Type[GridGraph],
+    block_name: str,
+    expected_size: Tuple[int, int]
+) -> Tuple[int, int, Tuple[int, int], List[Tuple[int, int]]]:
+    """Worker side of parallel loading: build a map and copy its grids into the parent's block.
+
+    The terrain grid fills the first width * height bytes of the block,
+    followed by the uint16 cost grid. The block belongs to the parent, which
+    unlinks it.
+
+    Returns:
+        (width, height, source, destinations) of the map as built.
+
+    Raises:
+        ValueError: If the built map is not expected_size, the (width, height)
+            the parent made the block for.
+    """
+    if cache_dir is not None:
+        info = load_cached_graph(path, cache_dir)
+    else:
+        info = build_graph_info(path, graph_class)
+    graph = info["graph"]
+    if (graph.width, graph.height) != tuple(expected_size):
+        raise ValueError(f"{path} was built as {graph.width}x{graph.height}, "
+                         f"not the {expected_size[0]}x{expected_size[1]} its header gives")
+    size = graph.width * graph.height
+
+    block = SharedMemory(name=block_name)
+    try:
+        data = np.ndarray((3 * size,), dtype=np.uint8, buffer=block.buf)
+        data[:size] = graph.terrain
+        data[size:].view(np.uint16)[:] = graph.cost
+        del data
+    finally:
+        block.close()
+    return graph.width, graph.height, info["source"], info["destinations"]
+
+
+def _read_shared_graph(
+    block: SharedMemory,
+    width: int,
+    height: int,
+    graph_class: Type[GridGraph] = GridGraph
+) -> GridGraph:
+    """Copy the grids a worker wrote to a shared memory block into a graph_class."""
+    size = width * height
+    data = np.ndarray((3 * size,), dtype=np.uint8, buffer=block.buf)
+    terrain = data[:size].copy()
+    cost = data[size:].view(np.uint16).copy()
+    del data
+    return graph_class.from_arrays(width, height, terrain, cost)
+
+
+def _load_all_graphs_parallel(
+    map_files: Dict[str, str],
+    cache_dir: Optional[str],
+    workers: int,
+    graph_class: Type[GridGraph] = GridGraph
+) -> Dict[str, Dict]:
+    """Build the GridGraphs of map_files in a pool of worker processes.
+
+    The parent creates one shared memory block per map, sized from the map
+    header, and unlinks all of them when it is done, whether the workers
+    succeeded or not. Workers report the size they actually built, which must
+    match the header.
+
+    Raises:
+        ValueError: If a map is not the size its header gives.
+    """
+    graphs_info = {}
+    blocks = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for name, path in map_files.items():
+                # Grid files are memory-mapped, which is cheaper than any copy.
+                if path.lower().endswith(".grid"):
+                    continue
+                width, height = _map_size(path)
+                blocks[name] = (SharedMemory(create=True, size=max(3 * width * height, 1)), width, height)
+                futures[name] = executor.submit(
+                    _build_into_shared_memory, path, cache_dir, graph_class, blocks[name][0].name, (width, height))
+            for name, path in map_files.items():
+                if name not in futures:
+                    graphs_info[name] = build_graph_info(path, graph_class)
+                    continue
+                built_width, built_height, source, destinations = futures[name].result()
+                block, width, height = blocks[name]
+                if (built_width, built_height) != (width, height):
+                    raise ValueError(f"{path} was built as {built_width}x{built_height}, not {width}x{height}")
+                graphs_info[name] = {
+                    "graph": _read_shared_graph(block, width, height, graph_class),
+                    "source": source,
+                    "destinations": destinations
+                }
+    finally:
+        for block, _, _ in blocks.values():
+            block.close()
+            block.unlink()
     return graphs_info
@@ -1,52 +1,116 @@
-from build_map import build_map_from_txt
+import argparse
+import os
+
 from colors import Colors
-from draw_path import draw_path
-from load_graphs import load_all_graphs
+from draw_path import PathPainter, report_saved, save_images
+from grid_graph import GridGraph
+from instrumentation import ExpansionHeatmap, Profiler, export_json
+from load_graphs import attach_distance_fields, load_all_graphs
+from path_cache import PathCache
+from path_stream import fan_out
+from search_stats import SearchStats
 from zelda_journey import ZeldaJourney
 
 
 def main():
-    # 1. Build maps from TXT to BMP.
-    print("Generating maps from TXT files...")
-    build_map_from_txt("../Datasets/txt/main_map.txt", "../Datasets/bmp/main_map.bmp")
-
-    for i in range(3):
-        build_map_from_txt(
-            f"../Datasets/txt/dungeon_{i}.txt",
-            f"../Datasets/bmp/dungeon_{i}.bmp"
-        )
+    parser = argparse.ArgumentParser(description="Run Zelda's journey and draw its path.")
+    parser.add_argument("--no-draw", action="store_true", help="skip drawing the path images")
+    parser.add_argument("--profile", default=None,
+                        help="write search counters and phase timings as JSON to this file")
+    parser.add_argument("--heatmap", action="store_true",
+                        help="save an image of the nodes expanded on each map to ../Images/")
+    parser.add_argument("--search", choices=("a_star", "bidirectional_a_star", "field_path"), default="a_star",
+                        help="search run for every journey leg; field_path precomputes distance fields "
+                             "towards the special points and walks them (default: %(default)s)")
+    args = parser.parse_args()
 
-    # 2. Define map files.
+    # Search counters are only collected when asked for, so plain runs pay nothing for them.
+    profiler = Profiler()
+    heatmap = ExpansionHeatmap() if args.heatmap else None
+    instrumented = args.profile is not None or heatmap is not None
+    if instrumented and args.search == "field_path":
+        # Walking the fields expands nothing, which would leave the counters and heatmap empty.
+        print("Warning: --profile and --heatmap count search work; using a_star instead of field_path.")
+        args.search = "a_star"
+
+    # 1. Define map files.
     map_files = {
-        "main": "../Datasets/bmp/main_map.bmp",
-        **{f"dungeon_{i}": f"../Datasets/bmp/dungeon_{i}.bmp" for i in range(3)}
+        "main": "../Datasets/txt/main_map.txt",
+        **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
     }
 
-    # 3. Load graphs.
-    print("\nLoading graphs...")
-    graphs_info = load_all_graphs(map_files)
+    # 2. Load graphs straight from the TXT maps, reusing cached grids when the
+    #    maps have not changed.
+    print("Loading graphs...")
+    cache_dir = "../Datasets/cache"
+    with profiler.phase("load"):
+        graphs_info = load_all_graphs(map_files, graph_class=GridGraph, cache_dir=cache_dir)
+    # Then build the search structures over the loaded grids: distance fields
+    # towards every special point when the legs are walked on them.
+    with profiler.phase("build"):
+        if args.search == "field_path":
+            for name, info in graphs_info.items():
+                attach_distance_fields(info, map_files[name], cache_dir)
 
-    # 4. Run the journey.
+    # 3. Run the journey.
     print("Starting Zelda's journey...")
-    journey = ZeldaJourney(graphs_info, {
+    dungeons = {
         Colors.DUNGEON1: "dungeon_0",
         Colors.DUNGEON2: "dungeon_1",
         Colors.DUNGEON3: "dungeon_2",
-    })
-    final_path = journey.run()
+    }
+    path_cache = PathCache(search=args.search)
+    greedy_stats = SearchStats(on_expand=heatmap) if instrumented else None
+    journey = ZeldaJourney(graphs_info, dungeons, path_cache=path_cache, stats=greedy_stats)
+    # Stream every step to the detailed report and to the path painter as it is
+    # walked, rather than keeping the paths of the whole journey in memory.
+    painter = None
+    if not args.no_draw:
+        painter = PathPainter({name: info["graph"].colors() for name, info in graphs_info.items()})
+    print("\n--- Journey Report ---")
+    with profiler.phase("search"):
+        journey.run(sink=fan_out(ZeldaJourney.report_step, *([painter] if painter is not None else [])))
+    journey.report_summary()
+    print("----------------------")
 
-    # 5. Show results.
+    # 4. Show results.
     print("\n--- Journey Finished ---")
-    print(f"Total Path Length: {len(final_path)} steps")
+    print(f"Total Path Length: {journey.path_length} steps")
     print(f"Total Cost: {journey.total_cost}")
     print("------------------------")
-    
-    # Detailed report.
-    journey.get_report()
 
-    # Save and draw the path on the main map and the dungeons.
-    print("\nDrawing the path...")
-    draw_path(journey.steps, output_folder="../Images/")
+    # Compare the greedy order with the planned (optimal) visit order.
+    planned_stats = SearchStats(on_expand=heatmap) if instrumented else None
+    planned_journey = ZeldaJourney(graphs_info, dungeons, strategy="planned", path_cache=path_cache,
+                                   stats=planned_stats)
+    with profiler.phase("search"):
+        planned_journey.run()
+    print("\n--- Visit Order ---")
+    for result in (journey, planned_journey):
+        print(f"{result.strategy:>8}: total cost {result.total_cost}, planning time {result.planning_time:.4f}s, "
+              f"path cache {result.cache_hits} hits / {result.cache_misses} misses")
+
+    # 5. Save the path images of the main map and the dungeons.
+    if painter is not None:
+        print("\nDrawing the path...")
+        with profiler.phase("render"):
+            saved = save_images(painter.images(), "../Images/")
+        report_saved(saved)
+
+    if heatmap is not None:
+        os.makedirs("../Images/", exist_ok=True)
+        for name, info in graphs_info.items():
+            output_path = os.path.join("../Images/", f"{name}_expansions.png")
+            heatmap.image(info["graph"]).save(output_path)
+            print(f"Saved expansion heatmap: {output_path}")
+    if args.profile is not None:
+        export_json(
+            args.profile,
+            stats={"greedy": greedy_stats, "planned": planned_stats},
+            profiler=profiler,
+            total_cost={"greedy": journey.total_cost, "planned": planned_journey.total_cost},
+        )
+        print(f"Profile written to {args.profile}: {profiler}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+import argparse
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+from colors import Colors
+
+
+# Share of each terrain character on a generated overworld, close to main_map.txt.
+DEFAULT_MIX = {'G': 0.45, 'F': 0.13, 'M': 0.23, 'A': 0.10, 'W': 0.09}
+
+# Dungeon entrance characters on the overworld, in the order dungeons get them.
+DUNGEON_CHARS = ['1', '2', '3']
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse a terrain mix such as "G=0.5,F=0.2,M=0.3".
+
+    Raises:
+    - ValueError: If a character is not a passable terrain of Colors.char_to_color.
+    """
+    mix = {}
+    for item in text.split(','):
+        char, _, share = item.partition('=')
+        char = char.strip()
+        if char not in DEFAULT_MIX:
+            raise ValueError(f"Unknown terrain {char!r} (expected one of {sorted(DEFAULT_MIX)})")
+        mix[char] = float(share)
+    return mix
+
+
+def generate_overworld(
+    width: int,
+    height: int,
+    mix: Optional[Dict[str, float]] = None,
+    dungeons: int = 3,
+    seed: int = 0,
+    region_size: int = 8,
+    noise: float = 0.1
+) -> np.ndarray:
+    """Generate an overworld of terrain regions with Link, the Master Sword and dungeon entrances.
+
+    Terrain is drawn per region_size x region_size block following mix, then
+    a share noise of the cells (a tenth by default) are redrawn one by one, so
+    maps have both uniform regions and noise. Overworld terrains are all
+    passable, so every special point is reachable.
+
+    Parameters:
+    - width, height: Map size in cells.
+    - mix: Share of each terrain character (see DEFAULT_MIX); normalized.
+    - dungeons: Number of dungeon entrances, up to len(DUNGEON_CHARS).
+    - seed: Seed of the random generator; the same arguments give the same map.
+    - region_size: Side of the uniform terrain blocks.
+    - noise: Share of the cells redrawn after the blocks; 0 keeps the blocks uniform.
+
+    Returns:
+    - Array of shape (height, width) with the ASCII code of each cell.
+
+    Raises:
+    - ValueError: If there are too many dungeons or not enough cells.
+    """
+    if not 0 <= dungeons <= len(DUNGEON_CHARS):
+        raise ValueError(f"dungeons must be between 0 and {len(DUNGEON_CHARS)}")
+    if width * height < dungeons + 2:
+        raise ValueError("The map is too small for its special points")
+    mix = DEFAULT_MIX if mix is None else mix
+    rng = np.random.default_rng(seed)
+    chars = np.array([ord(char) for char in mix], dtype=np.uint8)
+    weights = np.array(list(mix.values()), dtype=np.float64)
+    weights /= weights.sum()
+
+    blocks = rng.choice(chars, size=(-(-height // region_size), -(-width // region_size)), p=weights)
+    grid = np.repeat(np.repeat(blocks, region_size, axis=0), region_size, axis=1)[:height, :width].copy()
+    redrawn = rng.integers(0, width * height, size=int(width * height * noise))
+    grid.ravel()[redrawn] = rng.choice(chars, size=len(redrawn), p=weights)
+
+    special = ['S'] + DUNGEON_CHARS[:dungeons] + ['L']
+    cells = rng.choice(width * height, size=len(special), replace=False)
+    # build_graph takes the last LINK or DUNGEON_ENTRANCE pixel in column-major
+    # order as the source, and dungeon 1 shares the entrance color: Link gets
+    # the last cell in that order.
+    ys, xs = np.divmod(cells, width)
+    cells = cells[np.argsort(xs * height + ys)]
+    grid.ravel()[cells] = [ord(char) for char in special]
+    return grid
+
+
+def generate_dungeon(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Generate a walled dungeon of small rooms chained by corridors, with an entrance and a pendant.
+
+    Rooms are carved at random and each is linked to the next by an L-shaped
+    corridor, so the first and last rooms, which hold the entrance and the
+    pendant, are always connected.
+
+    Returns:
+    - Array of shape (height, width) with the ASCII code of each cell.
+
+    Raises:
+    - ValueError: If the dungeon is smaller than 5 x 5 cells.
+    """
+    if width < 5 or height < 5:
+        raise ValueError("Dungeons need at least 5 x 5 cells")
+    rng = np.random.default_rng(seed)
+    grid = np.full((height, width), ord('X'), dtype=np.uint8)
+    floor = ord('C')
+    rooms = max(2, width * height // 300)
+    # Room centers stay off the outer wall.
+    xs = rng.integers(1, width - 1, size=rooms)
+    ys = rng.integers(1, height - 1, size=rooms)
+    half_widths = rng.integers(1, 3, size=rooms)
+    half_heights = rng.integers(1, 3, size=rooms)
+    for x, y, hw, hh in zip(xs, ys, half_widths, half_heights):
+        grid[max(1, y - hh):min(height - 1, y + hh + 1), max(1, x - hw):min(width - 1, x + hw + 1)] = floor
+    for (x0, y0), (x1, y1) in zip(zip(xs[:-1], ys[:-1]), zip(xs[1:], ys[1:])):
+        grid[y0, min(x0, x1):max(x0, x1) + 1] = floor
+        grid[min(y0, y1):max(y0, y1) + 1, x1] = floor
+    entrance, pendant = (xs[0], ys[0]), (xs[-1], ys[-1])
+    if pendant == entrance:
+        # Never put the pendant on the entrance.
+        pendant = (entrance[0] + 1 if entrance[0] + 1 < width - 1 else entrance[0] - 1, entrance[1])
+        grid[pendant[1], pendant[0]] = floor
+    # The pendant shares Link's color and the entrance dungeon 1's: build_graph
+    # only tells them apart when the pendant comes first in column-major order.
+    if pendant > entrance:
+        entrance, pendant = pendant, entrance
+    grid[entrance[1], entrance[0]] = ord('E')
+    grid[pendant[1], pendant[0]] = ord('P')
+    return grid
+
+
+def write_map(grid: np.ndarray, file_path: str) -> None:
+    """Write an array of ASCII codes as a text map, one row per line."""
+    height, width = grid.shape
+    lines = np.empty((height, width + 1), dtype=np.uint8)
+    lines[:, :width] = grid
+    lines[:, width] = ord('\n')
+    lines.tofile(file_path)
+
+
+def generate_world(
+    output_dir: str,
+    size: int,
+    dungeons: int = 3,
+    mix: Optional[Dict[str, float]] = None,
+    seed: int = 0,
+    dungeon_size: Optional[int] = None
+) -> Dict[str, str]:
+    """Write a size x size overworld and its dungeons as TXT maps.
+
+    Parameters:
+    - output_dir: Folder receiving main_map.txt and dungeon_<i>.txt.
+    - size: Width and height of the overworld.
+    - dungeons: Number of dungeons, up to len(DUNGEON_CHARS).
+    - mix: Terrain mix of the overworld (see DEFAULT_MIX).
+    - seed: Seed of the whole world.
+    - dungeon_size: Width and height of the dungeons; defaults to size // 4
+      (at least 16).
+
+    Returns:
+    - The map files by name ("main", "dungeon_0", ...), as load_all_graphs takes them.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    dungeon_size = max(16, size // 4) if dungeon_size is None else dungeon_size
+    map_files = {"main": os.path.join(output_dir, "main_map.txt")}
+    write_map(generate_overworld(size, size, mix, dungeons, seed), map_files["main"])
+    for i in range(dungeons):
+        map_files[f"dungeon_{i}"] = os.path.join(output_dir, f"dungeon_{i}.txt")
+        write_map(generate_dungeon(dungeon_size, dungeon_size, seed * len(DUNGEON_CHARS) + i), map_files[f"dungeon_{i}"])
+    return map_files
+
+
+def world_dungeons(dungeons: int = 3) -> Dict[tuple, str]:
+    """Return the ZeldaJourney dungeons mapping of a world written by generate_world."""
+    return {Colors.char_to_color[char]: f"dungeon_{i}" for i, char in enumerate(DUNGEON_CHARS[:dungeons])}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic overworld and dungeons as TXT maps.")
+    parser.add_argument("output_dir")
+    parser.add_argument("--size", type=int, default=256, help="overworld width and height")
+    parser.add_argument("--dungeons", type=int, default=3)
+    parser.add_argument("--dungeon-size", type=int, default=None)
+    parser.add_argument("--mix", type=parse_mix, default=None, help='terrain mix, e.g. "G=0.5,F=0.2,M=0.3"')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    map_files = generate_world(args.output_dir, args.size, args.dungeons, args.mix, args.seed, args.dungeon_size)
+    for name, path in map_files.items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+
+from graph import Graph
+from heuristics import Heuristic
+from search_stats import SearchStats
+
+
+class PathCache:
+    """Bounded LRU memo of point-to-point path queries.
+
+    Entries are keyed by (graph.version, source, target). A graph gets a new
+    version whenever it is rebuilt or its edges change, so stale entries are
+    never returned and simply age out of the cache. On symmetric graphs a
+    cached source -> target path also answers target -> source, reversed.
+
+    Any shortest path is a valid answer, so queries with different heuristics
+    share entries.
+
+    Parameters:
+    - max_entries: Number of paths kept before the least recently used is dropped.
+    - search: Name of the Graph method run on a miss, such as "a_star",
+      "bidirectional_a_star" or GridGraph's "field_path".
+    """
+
+    def __init__(self, max_entries: int = 1024, search: str = "a_star") -> None:
+        self.max_entries = max_entries
+        self.search = search
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def find_path(
+        self,
+        graph: Graph,
+        source: Tuple[int, int],
+        target: Tuple[int, int],
+        heuristic: Union[str, Heuristic, None] = None,
+        stats: Optional[SearchStats] = None
+    ) -> List[Tuple[int, int]]:
+        """Return a shortest path from source to target, searching only on a cache miss.
+
+        Parameters:
+        - stats: Optional SearchStats passed to the search on a miss.
+
+        Returns:
+        - The path as a new list (empty when target is unreachable).
+        """
+        key = (graph.version, source, target)
+        path = self.paths.get(key)
+        if path is not None:
+            self.hits += 1
+            self.paths.move_to_end(key)
+            return list(path)
+
+        reverse_key = (graph.version, target, source)
+        reverse_path = self.paths.get(reverse_key)
+        if reverse_path is not None and graph.is_symmetric():
+            self.hits += 1
+            self.paths.move_to_end(reverse_key)
+            return list(reversed(reverse_path))
+
+        self.misses += 1
+        path = getattr(graph, self.search)(source, [target], heuristic, stats)
+        self.paths[key] = tuple(path)
+        if len(self.paths) > self.max_entries:
+            self.paths.popitem(last=False)
+        return path
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        self.paths.clear()
+        self.hits = 0
+        self.misses = 0
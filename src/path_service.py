@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from batch import DEFAULT_DUNGEONS, DEFAULT_MAP_FILES, run_scenario
+from grid_graph import GridGraph
+from heuristics import HEURISTICS
+from load_graphs import load_all_graphs
+from path_cache import PathCache
+from search_stats import SearchStats
+from zelda_journey import ZeldaJourney
+
+
+# Latencies kept for the percentiles reported by /stats.
+LATENCY_WINDOW = 10000
+
+# Largest request body accepted, in bytes.
+MAX_BODY = 1 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+# Graphs of the current process. Loaded before the pool starts, so forked
+# workers share the parent's pages; spawned workers load them in _init_worker.
+_graphs_info = None
+_path_cache = None
+
+
+def _init_worker(map_files: Dict[str, str], cache_dir: Optional[str], landmarks: int = 0) -> None:
+    global _graphs_info, _path_cache
+    if _graphs_info is None:
+        _graphs_info = load_all_graphs(map_files, graph_class=GridGraph, cache_dir=cache_dir)
+        # Landmark selection is deterministic, so spawned workers build the same tables.
+        if landmarks:
+            for info in _graphs_info.values():
+                info["graph"].build_landmarks(landmarks)
+    _path_cache = PathCache()
+
+
+def _find_path(map_name: str, source: Tuple[int, int], destinations: List[Tuple[int, int]], heuristic: Optional[str]) -> Dict:
+    graph = _graphs_info[map_name]["graph"]
+    stats = SearchStats()
+    path = graph.a_star(source, destinations, heuristic=heuristic, stats=stats)
+    return {
+        "path": [list(pixel) for pixel in path],
+        "cost": sum(graph.adj[u][v] for u, v in zip(path[:-1], path[1:])) if path else None,
+        "expanded": stats.expanded
+    }
+
+
+def _run_journey(scenario: Dict) -> Dict:
+    return run_scenario(scenario, DEFAULT_DUNGEONS, _graphs_info, _path_cache)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list (None when it is empty)."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class RequestError(Exception):
+    """Client error, answered with the given HTTP status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class PathService:
+    """Serve a_star and ZeldaJourney queries from graphs kept in memory.
+
+    Searches run in a process pool. A query identical to one still running is
+    not submitted again: it waits for the running one. Finished results are
+    kept in a bounded LRU cache. The graphs never change while the service is
+    running, so cached results never go stale. When a worker dies, the queries
+    it was running fail with 500 and the pool is started again.
+
+    Endpoints (JSON bodies and replies):
+    - POST /path: {"map", "source": [x, y], "destinations": [[x, y], ...], "heuristic"}
+      -> {"path", "cost", "expanded"}. "map" defaults to "main". The "alt"
+      heuristic is only accepted when the service builds landmarks.
+    - POST /journey: a batch.load_scenarios scenario -> the batch.run_scenario result.
+    - GET /stats: request counts, cache and coalescing hits, queue depth and
+      latency percentiles in milliseconds.
+
+    Parameters:
+    - map_files: Map files passed to load_all_graphs.
+    - workers: Number of worker processes (defaults to the CPU count).
+    - cache_dir: Optional grid cache directory for load_all_graphs.
+    - max_cached: Number of results kept before the least recently used is dropped.
+    - landmarks: Landmarks built on every map at startup for the "alt"
+      heuristic; 0 builds none and rejects "alt".
+    """
+
+    def __init__(
+        self,
+        map_files: Dict[str, str],
+        workers: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        max_cached: int = 4096,
+        landmarks: int = 8
+    ) -> None:
+        self.map_files = map_files
+        self.workers = workers or os.cpu_count()
+        self.cache_dir = cache_dir
+        self.max_cached = max_cached
+        self.landmarks = landmarks
+        self.results = OrderedDict()
+        self.in_flight = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.searches = 0
+        # Searches submitted to the pool and not finished yet.
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.pool_restarts = 0
+        self.executor = None
+
+    def start(self) -> None:
+        """Load the graphs and start the worker pool."""
+        _init_worker(self.map_files, self.cache_dir, self.landmarks)
+        self.graphs_info = _graphs_info
+        self._start_pool()
+
+    def _start_pool(self) -> None:
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.map_files, self.cache_dir, self.landmarks)
+        )
+        # Fork the workers now: forked on the first query, they would inherit
+        # its client socket and keep the connection open after it is closed.
+        self.executor.submit(int).result()
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        """Replace a pool broken by a dead worker, unless another query already did."""
+        if self.executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.pool_restarts += 1
+        self._start_pool()
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def query(self, key: Tuple, function, *args) -> Dict:
+        """Return the result of function(*args), sharing it with identical queries.
+
+        key identifies the query: a cached result is returned at once, and a
+        query already running is awaited instead of being submitted again.
+        """
+        result = self.results.get(key)
+        if result is not None:
+            self.cache_hits += 1
+            self.results.move_to_end(key)
+            return result
+
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            future = loop.run_in_executor(executor, function, *args)
+        except BrokenProcessPool:
+            self._restart_pool(executor)
+            raise
+        self.in_flight[key] = future
+        self.searches += 1
+        self.queue_depth += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            result = await asyncio.shield(future)
+        except BrokenProcessPool:
+            self._restart_pool(executor)
+            raise
+        finally:
+            self.queue_depth -= 1
+            del self.in_flight[key]
+
+        self.results[key] = result
+        if len(self.results) > self.max_cached:
+            self.results.popitem(last=False)
+        return result
+
+    def _pixel(self, value, graph, field: str) -> Tuple[int, int]:
+        # bool is an int subclass, but true and false are not coordinates.
+        if not isinstance(value, list) or len(value) != 2 or not all(type(v) is int for v in value):
+            raise RequestError(400, f"{field} must be an [x, y] pair of integers")
+        pixel = (value[0], value[1])
+        if graph is not None and pixel not in graph.adj:
+            raise RequestError(400, f"{field} {list(pixel)} is not a traversable pixel")
+        return pixel
+
+    async def find_path(self, body: Dict) -> Dict:
+        map_name = body.get("map", "main")
+        if map_name not in self.graphs_info:
+            raise RequestError(404, f"Unknown map: {map_name!r}")
+        graph = self.graphs_info[map_name]["graph"]
+        source = self._pixel(body.get("source"), graph, "source")
+        destinations = body.get("destinations")
+        if not isinstance(destinations, list) or not destinations:
+            raise RequestError(400, "destinations must be a non-empty list of [x, y] pairs")
+        destinations = [self._pixel(pixel, graph, "destination") for pixel in destinations]
+        heuristic = body.get("heuristic")
+        if heuristic is not None and (not isinstance(heuristic, str) or heuristic not in HEURISTICS):
+            raise RequestError(400, f"heuristic must be one of {sorted(HEURISTICS)}")
+        if heuristic == "alt":
+            landmarks = getattr(graph, "landmarks", None)
+            if landmarks is None or landmarks.version != graph.version:
+                raise RequestError(400, f"The alt heuristic needs up-to-date landmarks, which {map_name!r} does not have")
+
+        key = ("path", map_name, source, tuple(sorted(set(destinations))), heuristic)
+        return await self.query(key, _find_path, map_name, source, destinations, heuristic)
+
+    async def run_journey(self, body: Dict) -> Dict:
+        main_graph = self.graphs_info["main"]["graph"]
+        scenario = {"id": body.get("id")}
+        if "start" in body:
+            scenario["start"] = list(self._pixel(body["start"], main_graph, "start"))
+        if "goal" in body:
+            scenario["goal"] = list(self._pixel(body["goal"], main_graph, "goal"))
+        if "dungeons" in body:
+            names = body["dungeons"]
+            if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+                raise RequestError(400, "dungeons must be a list of names")
+            unknown = sorted(set(names) - set(DEFAULT_DUNGEONS.values()))
+            if unknown:
+                raise RequestError(400, f"Unknown dungeons: {', '.join(unknown)}")
+            scenario["dungeons"] = sorted(set(names))
+        scenario["strategy"] = body.get("strategy", "greedy")
+        if scenario["strategy"] not in ZeldaJourney.STRATEGIES:
+            raise RequestError(400, f"strategy must be one of {list(ZeldaJourney.STRATEGIES)}")
+
+        key = ("journey", json.dumps({k: v for k, v in scenario.items() if k != "id"}, sort_keys=True))
+        result = await self.query(key, _run_journey, scenario)
+        return {**result, "id": scenario["id"]}
+
+    def stats(self) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "searches": self.searches,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "cached_results": len(self.results),
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "workers": self.workers,
+            "pool_restarts": self.pool_restarts,
+            "latency_ms": {
+                name: None if value is None else round(value * 1000, 3)
+                for name, value in (
+                    ("p50", percentile(latencies, 0.50)),
+                    ("p90", percentile(latencies, 0.90)),
+                    ("p99", percentile(latencies, 0.99)),
+                    ("max", latencies[-1] if latencies else None)
+                )
+            }
+        }
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Dict:
+        routes = {"/path": ("POST", self.find_path), "/journey": ("POST", self.run_journey), "/stats": ("GET", None)}
+        if target not in routes:
+            raise RequestError(404, f"Unknown endpoint: {target}")
+        expected, handler = routes[target]
+        if method != expected:
+            raise RequestError(405, f"{target} expects {expected}")
+        if handler is None:
+            return self.stats()
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as e:
+            raise RequestError(400, f"Invalid JSON: {e}")
+        if not isinstance(request, dict):
+            raise RequestError(400, "The request body must be a JSON object")
+        return await handler(request)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                status, reply, target = 200, None, None
+                # Without a valid Content-Length the body cannot be skipped, so
+                # the connection is closed instead of reading it as a request.
+                body_read = False
+                try:
+                    try:
+                        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                        length = int(headers.get("content-length", 0))
+                    except ValueError:
+                        raise RequestError(400, "Malformed request")
+                    if length < 0:
+                        raise RequestError(400, "Malformed request")
+                    if length > MAX_BODY:
+                        raise RequestError(413, f"Request body larger than {MAX_BODY} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    body_read = True
+                    if target != "/stats":
+                        self.requests += 1
+                    reply = await self.dispatch(method, target, body)
+                except RequestError as e:
+                    status, reply = e.status, {"error": str(e)}
+                except Exception as e:
+                    # Requests are validated while parsing, so anything else is a server error.
+                    status, reply = 500, {"error": f"{type(e).__name__}: {e}"}
+                if status != 200:
+                    self.errors += 1
+                elif target != "/stats":
+                    self.latencies.append(time.perf_counter() - start)
+
+                keep_alive = body_read and headers.get("connection", "").lower() != "close"
+                payload = json.dumps(reply, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080, unix_socket: Optional[str] = None) -> None:
+        """Start the pool and serve until cancelled, on TCP or on a Unix socket."""
+        self.start()
+        try:
+            if unix_socket is not None:
+                server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            else:
+                server = await asyncio.start_server(self.handle_connection, host, port)
+            addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+            print(f"Serving {len(self.graphs_info)} maps with {self.workers} workers on {addresses}", flush=True)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve shortest-path and journey queries over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: %(default)s)")
+    parser.add_argument("--cache-dir", default="../Datasets/cache", help="grid cache directory (default: %(default)s)")
+    parser.add_argument("--max-cached", type=int, default=4096, help="results kept in the LRU cache (default: %(default)s)")
+    parser.add_argument("--landmarks", type=int, default=8,
+                        help="landmarks per map for the alt heuristic, 0 to reject alt (default: %(default)s)")
+    args = parser.parse_args()
+
+    service = PathService(DEFAULT_MAP_FILES, workers=args.workers, cache_dir=args.cache_dir, max_cached=args.max_cached,
+                          landmarks=args.landmarks)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from distance_fields import MOVES
+
+
+# Move code of each (dx + 1) + 3 * (dy + 1); -1 for steps that are not a single move.
+_CODES = np.full(9, -1, dtype=np.int8)
+for _code, (_dx, _dy) in enumerate(MOVES):
+    _CODES[(_dx + 1) + 3 * (_dy + 1)] = _code
+_STEPS = np.array(MOVES, dtype=np.int32)
+
+# A sink receives the journey steps one at a time (see ZeldaJourney.run).
+Sink = Callable[[Dict], None]
+
+
+class EncodedPath:
+    """A grid path stored as its first pixel and one uint8 move code per step.
+
+    Codes index distance_fields.MOVES, so a path costs one byte per step
+    instead of a tuple per pixel. Iterating decodes the pixels one by one, and
+    np.asarray(path) decodes them all into an (n, 2) int32 array of (x, y).
+
+    Parameters:
+    - start: First pixel of the path.
+    - moves: uint8 move codes, one per step.
+    """
+
+    __slots__ = ("start", "moves")
+
+    def __init__(self, start: Tuple[int, int], moves: np.ndarray) -> None:
+        self.start = start
+        self.moves = moves
+
+    @classmethod
+    def encode(cls, path: Sequence[Tuple[int, int]]) -> "EncodedPath":
+        """Encode a non-empty list of pixels, each a 4-neighbor of the previous one.
+
+        Raises:
+        - ValueError: If the path is empty or makes a step that is not a single move.
+        """
+        if len(path) == 0:
+            raise ValueError("Cannot encode an empty path")
+        cells = np.asarray(path, dtype=np.int64).reshape(-1, 2)
+        steps = np.diff(cells, axis=0)
+        keys = (steps[:, 0] + 1) + 3 * (steps[:, 1] + 1)
+        valid = (np.abs(steps) <= 1).all(axis=1)
+        codes = np.where(valid, _CODES[np.clip(keys, 0, 8)], -1)
+        if (codes < 0).any():
+            index = int(np.argmax(codes < 0))
+            before, after = tuple(cells[index].tolist()), tuple(cells[index + 1].tolist())
+            raise ValueError(f"Step {before} -> {after} is not a single move")
+        return cls((int(cells[0, 0]), int(cells[0, 1])), codes.astype(np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.moves) + 1
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        x, y = self.start
+        yield (x, y)
+        for code in self.moves.tolist():
+            dx, dy = MOVES[code]
+            x += dx
+            y += dy
+            yield (x, y)
+
+    def __getitem__(self, index: int) -> Tuple[int, int]:
+        """Return the pixel at an integer index (negative indices count from the end)."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("EncodedPath index out of range")
+        dx, dy = _STEPS[self.moves[:index]].sum(axis=0, dtype=np.int64)
+        return (self.start[0] + int(dx), self.start[1] + int(dy))
+
+    def __array__(self, dtype: Any = None, copy: Optional[bool] = None) -> np.ndarray:
+        cells = np.empty((len(self), 2), dtype=np.int32)
+        cells[0] = self.start
+        np.cumsum(_STEPS[self.moves], axis=0, out=cells[1:])
+        cells[1:] += cells[0]
+        return cells if dtype is None else cells.astype(dtype)
+
+    def decode(self) -> List[Tuple[int, int]]:
+        """Return the path as a list of pixels."""
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"EncodedPath(start={self.start}, steps={len(self.moves)})"
+
+
+def fan_out(*sinks: Sink) -> Sink:
+    """Return a sink passing every step on to each of sinks, in order."""
+    def sink(step: Dict) -> None:
+        for target in sinks:
+            target(step)
+    return sink
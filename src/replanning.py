@@ -0,0 +1,238 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import heapq
+import time
+
+from graph import record_search
+from heuristics import DistanceFieldHeuristic, Heuristic, LandmarkHeuristic, get_heuristic
+from search_stats import SearchStats
+
+
+class LPAStar:
+    """Lifelong Planning A* between a fixed source and goal.
+
+    The first compute() is an ordinary A* search. After edge weights change
+    (see Graph.set_terrain), notify() marks the pixels whose edges changed and
+    the next compute() only revisits the nodes whose cost from the source is
+    affected, reusing the rest of the previous search.
+
+    The heuristic must stay consistent across the changes, which the default
+    Manhattan estimate does for any COLOR_WEIGHTS. Estimates derived from the
+    costs at bind time ("weighted", "field", "alt") may not, so they are
+    rejected. The graph must be undirected, as those built by build_graph are.
+
+    Parameters:
+    - graph: The graph searched; changed in place between searches.
+    - source: Start pixel.
+    - goal: Target pixel.
+    - heuristic: As in Graph.a_star, except for the estimates derived from the costs.
+
+    Raises:
+    - ValueError: If the graph is directed or the heuristic depends on the costs.
+    """
+
+    def __init__(
+        self,
+        graph: Any,
+        source: Tuple[int, int],
+        goal: Tuple[int, int],
+        heuristic: Union[str, Heuristic, None] = None
+    ) -> None:
+        if not graph.is_symmetric():
+            raise ValueError("LPAStar needs every edge to weigh the same both ways")
+        estimate = get_heuristic(heuristic)
+        if (isinstance(estimate, (DistanceFieldHeuristic, LandmarkHeuristic))
+                or getattr(estimate, "scale", 1) is None):
+            raise ValueError(f"LPAStar cannot use the {heuristic!r} heuristic, which is derived "
+                             "from the costs at bind time and may overestimate after a change")
+        self.graph = graph
+        self.source = source
+        self.goal = goal
+        self.estimate = estimate.bind(graph, [goal])
+        # g: settled costs; rhs: one-step lookahead costs. Missing means infinity.
+        self.g = {}
+        self.rhs = {source: 0}
+        # Current key of every queued node; heap entries with another key are stale.
+        self.keys = {}
+        self.queue = []
+        # Pushes since the last compute(), and entries it left in the queue.
+        self._pushed = 0
+        self._left_open = 0
+        self._enqueue(source)
+
+    def _neighbors(self, node: Tuple[int, int]) -> Dict[Tuple[int, int], float]:
+        adj = self.graph.adj
+        return adj[node] if node in adj else {}
+
+    def _key(self, node: Tuple[int, int]) -> Tuple[float, float]:
+        best = min(self.g.get(node, float('inf')), self.rhs.get(node, float('inf')))
+        return (best + self.estimate(node), best)
+
+    def _enqueue(self, node: Tuple[int, int]) -> None:
+        key = self._key(node)
+        self.keys[node] = key
+        heapq.heappush(self.queue, (key, node))
+        self._pushed += 1
+
+    def _update_vertex(self, node: Tuple[int, int]) -> None:
+        inf = float('inf')
+        if node != self.source:
+            g = self.g
+            self.rhs[node] = min(
+                (g.get(neighbor, inf) + weight for neighbor, weight in self._neighbors(node).items()),
+                default=inf
+            )
+        if self.g.get(node, inf) != self.rhs.get(node, inf):
+            self._enqueue(node)
+        else:
+            self.keys.pop(node, None)
+
+    def notify(self, pixels: Iterable[Tuple[int, int]]) -> None:
+        """Take into account that the edges of pixels changed since the last compute()."""
+        for pixel in pixels:
+            self._update_vertex(pixel)
+
+    def compute(self, stats: Optional[SearchStats] = None) -> List[Tuple[int, int]]:
+        """Bring the search up to date and return a shortest path from source to goal.
+
+        Parameters:
+        - stats: Optional SearchStats receiving the counters of this call only
+          (pushes include those of notify() since the last call), and whose
+          on_expand hook sees every expanded node.
+
+        Returns:
+        - The path, or an empty list when the goal is unreachable.
+        """
+        inf = float('inf')
+        g, rhs, keys, queue = self.g, self.rhs, self.keys, self.queue
+        goal = self.goal
+        expanded = 0
+        start = time.perf_counter() if stats is not None else 0.0
+        on_expand = stats.on_expand if stats is not None else None
+        peak_open = len(queue)
+        while queue:
+            key, current = queue[0]
+            if keys.get(current) != key:
+                heapq.heappop(queue)
+                continue
+            if key >= self._key(goal) and g.get(goal, inf) == rhs.get(goal, inf):
+                break
+            heapq.heappop(queue)
+            del keys[current]
+            expanded += 1
+            if g.get(current, inf) > rhs.get(current, inf):
+                g[current] = rhs[current]
+            else:
+                g[current] = inf
+                self._update_vertex(current)
+            for neighbor in self._neighbors(current):
+                self._update_vertex(neighbor)
+            if stats is not None:
+                peak_open = max(peak_open, len(queue))
+                if on_expand is not None:
+                    on_expand(self.graph, current, g[current])
+        if stats is not None:
+            # Entries carried over from the previous call were pushed before it.
+            record_search(stats, start, expanded, self._pushed, len(queue) - self._left_open, peak_open)
+        self._pushed = 0
+        self._left_open = len(queue)
+        return self.path()
+
+    @property
+    def cost(self) -> float:
+        """Cost of the current shortest path (infinity when there is none)."""
+        return self.g.get(self.goal, float('inf'))
+
+    def path(self) -> List[Tuple[int, int]]:
+        """Follow the cheapest predecessors back from the goal to the source."""
+        inf = float('inf')
+        if self.cost == inf:
+            return []
+        g = self.g
+        node = self.goal
+        path = [node]
+        while node != self.source:
+            node = min(self._neighbors(node).items(), key=lambda item: g.get(item[0], inf) + item[1])[0]
+            path.append(node)
+        path.reverse()
+        return path
+
+
+class JourneyReplanner:
+    """Keeps the legs of a finished ZeldaJourney up to date as terrain changes.
+
+    Every step of the journey gets its own LPAStar between the same endpoints.
+    repair() feeds the pixels returned by Graph.set_terrain to the planners of
+    that map and rewrites the affected steps, the total cost and the full path
+    of the journey. The visit order chosen by the journey is kept.
+
+    Parameters:
+    - journey: A ZeldaJourney on which run() has been called.
+    - heuristic: As in LPAStar.
+    - stats: Optional SearchStats receiving the counts of the initial searches.
+    """
+
+    def __init__(self, journey, heuristic: Union[str, Heuristic, None] = None,
+                 stats: Optional[SearchStats] = None) -> None:
+        self.journey = journey
+        self.planners = []
+        for step in journey.steps:
+            graph = journey.graphs_info[step["Map"]]["graph"]
+            planner = LPAStar(graph, step["Path"][0], step["Path"][-1], heuristic)
+            planner.compute(stats)
+            self.planners.append(planner)
+        # Steps whose planner was brought up to date by a repair that failed.
+        self._pending = set()
+
+    def repair(self, changes: Dict[str, Iterable[Tuple[int, int]]], stats: Optional[SearchStats] = None) -> List[int]:
+        """Repair the legs crossing maps whose terrain changed.
+
+        Parameters:
+        - changes: Pixels returned by set_terrain, keyed by map name.
+        - stats: Optional SearchStats receiving the counts of the repairs.
+
+        Every leg is repaired before the journey is touched, so a failure leaves
+        its steps, total cost and full path as they were.
+
+        Returns:
+        - Indices of the steps whose path changed.
+
+        Raises:
+        - ValueError: If a leg has become unreachable.
+        """
+        changes = {name: list(pixels) for name, pixels in changes.items()}
+        journey = self.journey
+        repaired = {}
+        unreachable = None
+        for index, (step, planner) in enumerate(zip(journey.steps, self.planners)):
+            if step["Map"] in changes:
+                planner.notify(changes[step["Map"]])
+                path = planner.compute(stats)
+            elif index in self._pending:
+                path = planner.path()
+            else:
+                continue
+            repaired[index] = path
+            if not path and unreachable is None:
+                unreachable = step["Action"]
+        if unreachable is not None:
+            self._pending.update(repaired)
+            raise ValueError(f"{unreachable} is no longer reachable")
+        self._pending.clear()
+
+        changed_steps = []
+        for index, path in repaired.items():
+            step, planner = journey.steps[index], self.planners[index]
+            if path != step["Path"] or planner.cost != step["IncrementalCost"]:
+                step["Path"] = path
+                step["PathLength"] = len(path)
+                step["IncrementalCost"] = planner.cost
+                changed_steps.append(index)
+
+        total_cost = 0
+        journey.full_path = []
+        for step in journey.steps:
+            total_cost += step["IncrementalCost"]
+            step["TotalCost"] = total_cost
+            journey.full_path.extend(step["Path"])
+        journey.total_cost = total_cost
+        return changed_steps
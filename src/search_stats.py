@@ -0,0 +1,81 @@
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SearchStats:
+    """Counters collected by the graph searches.
+
+    A single SearchStats can be passed to several searches: the counters add up,
+    and `searches` tells how many searches contributed to them. `peak_open` is
+    the largest open set of any of them.
+
+    Searches called without a SearchStats skip all of this bookkeeping.
+
+    Parameters:
+    - on_expand: Optional hook called as on_expand(graph, node, g) for every node
+      expanded by Graph.a_star, shortest_paths and bidirectional_a_star, e.g. an
+      instrumentation.ExpansionHeatmap.
+    - keep_searches: Also keep the counters of every single search in `history`.
+    """
+
+    def __init__(
+        self,
+        on_expand: Optional[Callable[[Any, Any, float], None]] = None,
+        keep_searches: bool = False
+    ) -> None:
+        self.searches = 0
+        self.expanded = 0
+        self.pushed = 0
+        self.popped = 0
+        # Pops of entries superseded by a cheaper push of the same node.
+        self.stale = 0
+        self.peak_open = 0
+        self.seconds = 0.0
+        self.on_expand = on_expand
+        self.history: Optional[List[Dict]] = [] if keep_searches else None
+
+    def record(
+        self,
+        expanded: int,
+        pushed: int,
+        popped: Optional[int] = None,
+        stale: int = 0,
+        peak_open: int = 0,
+        seconds: float = 0.0
+    ) -> None:
+        """Add the counters of one finished search.
+
+        Searches that do not count their pops are taken to pop every node they
+        expand, and nothing else.
+        """
+        popped = expanded + stale if popped is None else popped
+        self.searches += 1
+        self.expanded += expanded
+        self.pushed += pushed
+        self.popped += popped
+        self.stale += stale
+        self.peak_open = max(self.peak_open, peak_open)
+        self.seconds += seconds
+        if self.history is not None:
+            self.history.append({
+                "expanded": expanded, "pushed": pushed, "popped": popped,
+                "stale": stale, "peak_open": peak_open, "seconds": seconds
+            })
+
+    def to_dict(self) -> Dict:
+        """Return the counters (and the per-search history, if kept) as JSON-serializable values."""
+        counters = {
+            "searches": self.searches,
+            "expanded": self.expanded,
+            "pushed": self.pushed,
+            "popped": self.popped,
+            "stale": self.stale,
+            "peak_open": self.peak_open,
+            "seconds": self.seconds,
+        }
+        if self.history is not None:
+            counters["history"] = list(self.history)
+        return counters
+
+    def __repr__(self) -> str:
+        return (f"SearchStats(searches={self.searches}, expanded={self.expanded}, pushed={self.pushed}, "
+                f"popped={self.popped}, stale={self.stale}, peak_open={self.peak_open})")
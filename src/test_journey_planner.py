@@ -0,0 +1,67 @@
+import pytest
+
+from colors import Colors
+from grid_graph import GridGraph
+from journey_planner import plan_route
+from load_graphs import load_all_graphs
+from zelda_journey import ZeldaJourney
+
+
+INF = float('inf')
+
+MAP_FILES = {
+    "main": "../Datasets/txt/main_map.txt",
+    **{f"dungeon_{i}": f"../Datasets/txt/dungeon_{i}.txt" for i in range(3)}
+}
+DUNGEONS = {
+    Colors.DUNGEON1: "dungeon_0",
+    Colors.DUNGEON2: "dungeon_1",
+    Colors.DUNGEON3: "dungeon_2",
+}
+
+
+def _matrix_with_unreachable_stop(stops: int):
+    """Symmetric matrix from node 0 to the last node where stop 2 cannot be reached."""
+    size = stops + 2
+    matrix = [[abs(i - j) * 10 for j in range(size)] for i in range(size)]
+    for i in range(size):
+        if i != 2:
+            matrix[i][2] = matrix[2][i] = INF
+    return matrix
+
+
+@pytest.mark.parametrize("exact_limit", [12, 0])
+def test_plan_route_rejects_unreachable_stop(exact_limit):
+    with pytest.raises(ValueError):
+        plan_route(_matrix_with_unreachable_stop(3), exact_limit=exact_limit)
+
+
+def test_plan_route_visits_every_stop():
+    matrix = [[abs(i - j) * 10 for j in range(5)] for i in range(5)]
+    cost, order = plan_route(matrix)
+    assert cost == 40
+    assert order == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("strategy", ZeldaJourney.STRATEGIES)
+def test_journey_fails_when_a_dungeon_is_walled_off(strategy):
+    graphs_info = load_all_graphs(MAP_FILES, graph_class=GridGraph)
+    main_info = graphs_info["main"]
+    main_graph = main_info["graph"]
+    entry = next(
+        dest for dest in main_info["destinations"]
+        if main_graph.color_at(dest) == Colors.DUNGEON3
+    )
+    cost = main_graph.cost.copy()
+    for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        x, y = entry[0] + dx, entry[1] + dy
+        if 0 <= x < main_graph.width and 0 <= y < main_graph.height:
+            cost[main_graph.index((x, y))] = 0
+    graphs_info["main"] = {
+        **main_info,
+        "graph": GridGraph.from_arrays(main_graph.width, main_graph.height, main_graph.terrain.copy(), cost)
+    }
+
+    journey = ZeldaJourney(graphs_info, DUNGEONS, strategy=strategy)
+    with pytest.raises(ValueError, match="Nenhuma dungeon alcançável"):
+        journey.run()
@@ -1,118 +1,234 @@
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional, Union
+import time
 
 from colors import Colors
-from graph import Graph
+from graph import Graph, reconstruct_path
+from heuristics import Heuristic
+from journey_planner import cost_matrix, plan_route
+from path_cache import PathCache
+from path_stream import EncodedPath, Sink
+from search_stats import SearchStats
 
 
 class ZeldaJourney:
 
-    def __init__(self, graphs_info: Dict[str, Dict], dungeons: Dict[Tuple, str]):
+    # Ways of choosing the order in which the dungeons are visited.
+    STRATEGIES = ("greedy", "planned")
+
+    def __init__(
+        self,
+        graphs_info: Dict[str, Dict],
+        dungeons: Dict[Tuple, str],
+        heuristic: Union[str, Heuristic, None] = None,
+        strategy: str = "greedy",
+        path_cache: Optional[PathCache] = None,
+        start: Optional[Tuple[int, int]] = None,
+        goal: Optional[Tuple[int, int]] = None,
+        stats: Optional[SearchStats] = None
+    ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy!r} (expected one of {self.STRATEGIES})")
         self.graphs_info = graphs_info
         self.dungeons = dungeons
+        # A* heuristic for every search, e.g. "alt" once the graphs have landmarks.
+        self.heuristic = heuristic
+        self.strategy = strategy
+        # Overworld start and final target; default to Link and the Master Sword.
+        self.start = start
+        self.goal = goal
         self.total_cost = 0
+        # Pixels walked over the whole journey, counting each step's path.
+        self.path_length = 0
         self.full_path = []
         self.steps = []
+        # Receives the steps while a streaming run() is in progress.
+        self._sink = None
+        # Seconds spent choosing the dungeon order.
+        self.planning_time = 0.0
+        # Point-to-point paths; share one PathCache across journeys on the same graphs.
+        self.path_cache = PathCache() if path_cache is None else path_cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Optional counters (and on_expand hook) of every search the journey runs;
+        # legs answered by the path cache run no search.
+        self.stats = stats
 
-    def run(self) -> List[Tuple[int, int]]:
+    def run(self, sink: Optional[Sink] = None) -> List[Tuple[int, int]]:
         """Execute the complete journey: collect all pendants across the dungeons
         and finally reach the Master Sword.
 
         The journey proceeds in the following order:
             1. From Link's starting position on the overworld, travel to the
-               nearest dungeon entrance.
+               next dungeon entrance.
             2. Inside the dungeon, travel from entrance to the pendant.
             3. Travel back from the pendant to the entrance (to exit the dungeon).
             4. Repeat until all dungeons are completed.
             5. Finally, from the last dungeon exit, travel to the Master Sword.
 
-        The nearest dungeon at each step is chosen dynamically based on the
-        A* pathfinding cost from the current position.
+        With the "greedy" strategy, the nearest dungeon at each step is chosen
+        dynamically based on the shortest-path cost from the current position,
+        found by a single Dijkstra sweep towards all remaining dungeons. With
+        the "planned" strategy, the whole visit order is solved up front from
+        the pairwise overworld costs (see journey_planner.plan_route).
+
+        Parameters:
+            sink: Optional callable receiving each step as soon as it is walked,
+                with its "Path" as a compact path_stream.EncodedPath. The steps
+                are then neither kept in self.steps nor added to
+                self.full_path, so memory does not grow with the journey;
+                total_cost and path_length are still kept up to date.
 
         Returns:
             List[Tuple[int, int]]: The complete path (sequence of pixel coordinates)
-            that Link follows during the entire journey.
+            that Link follows during the entire journey; empty when streaming.
         """
+        self._sink = sink
+        try:
+            self._run()
+        finally:
+            self._sink = None
+        return self.full_path
+
+    def _run(self) -> None:
+        """Walk every leg of the journey (see run)."""
+        hits, misses = self.path_cache.hits, self.path_cache.misses
+
         # Initialize from main map data.
         main_info = self.graphs_info["main"]
         main_graph = main_info["graph"]
-        current_pixel = main_info["source"]
+        current_pixel = main_info["source"] if self.start is None else self.start
 
         # Filter which pixels on the main map are dungeon entrances.
         remaining_dungeons = {
-            dest: self.dungeons[main_graph.image.getpixel(dest)]
+            dest: self.dungeons[main_graph.color_at(dest)]
             for dest in self.graphs_info["main"]["destinations"]
-            if main_graph.image.getpixel(dest) in self.dungeons
+            if main_graph.color_at(dest) in self.dungeons
         }
+        master_sword_pixel = self.goal
+        if master_sword_pixel is None:
+            master_sword_pixel = [
+                dest for dest in main_info["destinations"]
+                if main_info["graph"].color_at(dest) == Colors.MASTER_SWORD
+            ][0]
+
+        if self.strategy == "planned":
+            start = time.perf_counter()
+            entries = list(remaining_dungeons)
+            matrix = cost_matrix(main_graph, [current_pixel] + entries + [master_sword_pixel], self.stats)
+            try:
+                _, order = plan_route(matrix)
+            except ValueError:
+                raise ValueError("Nenhuma dungeon alcançável encontrada.")
+            self.planning_time = time.perf_counter() - start
 
-        # While there are still dungeons to visit.
-        while remaining_dungeons:
-            best_entry = None
-            best_path = None
-            best_cost = float("inf")
-
-            # Find nearest reachable dungeon.
-            for entry_pixel, dungeon_name in remaining_dungeons.items():
-                path = main_graph.a_star(current_pixel, [entry_pixel])
-                if path:
-                    cost = self._path_cost(main_graph, path)
+            for previous, index in zip(order[:-2], order[1:-1]):
+                entry_pixel = entries[index - 1]
+                path = self.path_cache.find_path(main_graph, current_pixel, entry_pixel, self.heuristic, self.stats)
+                if not path:
+                    raise ValueError("Nenhuma dungeon alcançável encontrada.")
+
+                # 1. Overworld: Current position → dungeon entrance.
+                self._add_path_and_cost(
+                    "main", path, action=f"Overworld → {remaining_dungeons[entry_pixel]}",
+                    cost=matrix[previous][index])
+
+                # 2-3. Dungeon: entrance → pendant → entrance.
+                self._visit_dungeon(remaining_dungeons[entry_pixel])
+                current_pixel = entry_pixel
+        else:
+            # While there are still dungeons to visit.
+            while remaining_dungeons:
+                best_entry = None
+                best_path = None
+                best_cost = float("inf")
+
+                # Find nearest reachable dungeon with a single sweep towards all of them.
+                start = time.perf_counter()
+                costs, came_from = main_graph.shortest_paths(current_pixel, list(remaining_dungeons), self.stats)
+                for entry_pixel in remaining_dungeons:
+                    cost = costs.get(entry_pixel, float("inf"))
                     if cost < best_cost:
                         best_cost = cost
                         best_entry = entry_pixel
-                        best_path = path
+                if best_entry is not None:
+                    best_path = reconstruct_path(came_from, best_entry)
+                self.planning_time += time.perf_counter() - start
 
-            if best_entry is None or best_path is None:
-                raise ValueError("Nenhuma dungeon alcançável encontrada.")
-
-            # 1. Overworld: Current position → dungeon entrance.
-            self._add_path_and_cost(
-                main_graph, best_path, action=f"Overworld → {remaining_dungeons[best_entry]}")
+                if best_entry is None or best_path is None:
+                    raise ValueError("Nenhuma dungeon alcançável encontrada.")
 
-            # 2. Dungeon: entrance → pendant.
-            dungeon_info = self.graphs_info[remaining_dungeons[best_entry]]
-            dungeon_graph = dungeon_info["graph"]
-            pendant_pixel = dungeon_info["destinations"][0]
-            path_to_pendant = dungeon_graph.a_star(
-                dungeon_info["source"], [pendant_pixel])
-            self._add_path_and_cost(
-                dungeon_graph, path_to_pendant, action=f"{remaining_dungeons[best_entry]} → Pendant")
+                # 1. Overworld: Current position → dungeon entrance.
+                self._add_path_and_cost(
+                    "main", best_path, action=f"Overworld → {remaining_dungeons[best_entry]}", cost=best_cost)
 
-            # 3. Dungeon: pendant → entrance.
-            path_back = dungeon_graph.a_star(
-                pendant_pixel, [dungeon_info["source"]])
-            self._add_path_and_cost(
-                dungeon_graph, path_back, action=f"Pendant → Exit {remaining_dungeons[best_entry]}")
+                # 2-3. Dungeon: entrance → pendant → entrance.
+                self._visit_dungeon(remaining_dungeons[best_entry])
 
-            current_pixel = best_entry
-            del remaining_dungeons[best_entry]
+                current_pixel = best_entry
+                del remaining_dungeons[best_entry]
 
         # 4. Overworld: dungeon exit/entrance → Master Sword.
-        master_sword_pixel = [
-            dest for dest in main_info["destinations"]
-            if main_info["graph"].image.getpixel(dest) == Colors.MASTER_SWORD
-        ][0]
+        path_to_master_sword = self.path_cache.find_path(
+            main_graph, current_pixel, master_sword_pixel, self.heuristic, self.stats)
+        self._add_path_and_cost(
+            "main", path_to_master_sword, action="Exit Dungeons → Master Sword")
 
-        path_to_master_sword = main_graph.a_star(
-            current_pixel, [master_sword_pixel])
+        self.cache_hits = self.path_cache.hits - hits
+        self.cache_misses = self.path_cache.misses - misses
+
+    def _visit_dungeon(self, dungeon_name: str) -> None:
+        """Walk from a dungeon's entrance to its pendant and back, recording both segments."""
+        # 2. Dungeon: entrance → pendant.
+        dungeon_info = self.graphs_info[dungeon_name]
+        dungeon_graph = dungeon_info["graph"]
+        pendant_pixel = dungeon_info["destinations"][0]
+        path_to_pendant = self.path_cache.find_path(
+            dungeon_graph, dungeon_info["source"], pendant_pixel, self.heuristic, self.stats)
         self._add_path_and_cost(
-            main_graph, path_to_master_sword, action="Exit Dungeons → Master Sword")
+            dungeon_name, path_to_pendant, action=f"{dungeon_name} → Pendant")
 
-        return self.full_path
+        # 3. Dungeon: pendant → entrance.
+        path_back = self.path_cache.find_path(
+            dungeon_graph, pendant_pixel, dungeon_info["source"], self.heuristic, self.stats)
+        self._add_path_and_cost(
+            dungeon_name, path_back, action=f"Pendant → Exit {dungeon_name}")
+
+    def _add_path_and_cost(
+        self,
+        map_name: str,
+        path: List[Tuple[int, int]],
+        action: str,
+        cost: Optional[int] = None
+    ) -> None:
+        """Add a path segment to the journey, update total cost, and record the step.
 
-    def _add_path_and_cost(self, graph: Graph, path: List[Tuple[int, int]], action: str) -> None:
-        """Add a path segment to the journey, update total cost, and record the step."""
+        The cost of the segment is computed from the map's graph unless already
+        known. While streaming, the step goes to the sink instead of self.steps.
+
+        Raises:
+            ValueError: If path is empty, i.e. the leg's target is unreachable.
+        """
         if not path:
-            return
-        incremental_cost = self._path_cost(graph, path)
-        self.full_path.extend(path)
+            raise ValueError(f"{action}: target unreachable on {map_name}")
+        graph = self.graphs_info[map_name]["graph"]
+        incremental_cost = self._path_cost(graph, path) if cost is None else cost
         self.total_cost += incremental_cost
+        self.path_length += len(path)
 
-        self.steps.append({
+        step = {
             "Action": action,
             "PathLength": len(path),
             "IncrementalCost": incremental_cost,
             "TotalCost": self.total_cost,
+            "Map": map_name,
             "Path": path
-        })
+        }
+        if self._sink is not None:
+            step["Path"] = EncodedPath.encode(path)
+            self._sink(step)
+            return
+        self.full_path.extend(path)
+        self.steps.append(step)
 
     def _path_cost(self, graph: Graph, path: List[Tuple[int, int]]) -> int:
         """Calculate cost of a path segment."""
@@ -121,9 +237,25 @@ class ZeldaJourney:
     def get_report(self) -> None:
         """Print a human-readable journey report."""
         print("\n--- Journey Report ---")
+        self.report_summary()
         for step in self.steps:
-            print(f"{step['Action']}:")
-            print(f"   Segment length : {step['PathLength']} steps")
-            print(f"   Incremental cost: {step['IncrementalCost']}")
-            print(f"   Total cost so far: {step['TotalCost']}")
+            self.report_step(step)
         print("----------------------")
+
+    @staticmethod
+    def report_step(step: Dict) -> None:
+        """Print one step of the report; also usable as a run() sink."""
+        print(f"{step['Action']}:")
+        print(f"   Segment length : {step['PathLength']} steps")
+        print(f"   Incremental cost: {step['IncrementalCost']}")
+        print(f"   Total cost so far: {step['TotalCost']}")
+
+    def report_summary(self) -> None:
+        """Print the strategy, path cache and search lines of the report."""
+        print(f"Strategy: {self.strategy} (planning time: {self.planning_time:.4f}s)")
+        print(f"Path cache: {self.cache_hits} hits, {self.cache_misses} misses")
+        if self.stats is not None:
+            stats = self.stats
+            print(f"Searches: {stats.searches} ({stats.seconds:.4f}s), {stats.expanded} expanded, "
+                  f"{stats.pushed} pushed, {stats.popped} popped ({stats.stale} stale), "
+                  f"peak open set {stats.peak_open}")